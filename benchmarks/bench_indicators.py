@@ -0,0 +1,55 @@
+"""
+benchmark of IndicatorEngine on a 500 symbol x 10 year panel
+
+    python benchmarks/bench_indicators.py
+"""
+import time
+import numpy as np
+import pandas as pd
+
+from pynse.indicators import IndicatorEngine
+
+SYMBOLS = 500
+DAYS = 2520
+
+
+def make_panel(days=DAYS, symbols=SYMBOLS, seed=0):
+    rng = np.random.RandomState(seed)
+    close = 100. * np.exp(np.cumsum(rng.normal(0., 0.02, (days, symbols)), axis=0))
+    spread = np.abs(rng.normal(0., 0.01, (days, symbols))) * close
+    # symbols listed later in the period
+    for col in range(0, symbols, 25):
+        close[:rng.randint(days // 2), col] = np.nan
+    return {'dates': pd.bdate_range('2010-01-01', periods=days),
+            'symbols': pd.Index([f'S{i:03d}' for i in range(symbols)]),
+            'open': close, 'high': close + spread, 'low': close - spread, 'close': close,
+            'volume': rng.randint(1, 10 ** 6, (days, symbols)).astype(float)}
+
+
+def main():
+    panel = make_panel()
+    engine = IndicatorEngine(panel, sma=(20, 50, 200), ema=(12, 26), rsi=(14,), atr=(14,), bollinger=((20, 2.),))
+
+    start = time.perf_counter()
+    results = engine.compute()
+    elapsed = time.perf_counter() - start
+    print(f'compute: {len(results)} indicators, {DAYS} days x {SYMBOLS} symbols in {elapsed * 1000:.0f} ms')
+
+    start = time.perf_counter()
+    for _ in range(100):
+        engine.update(panel['open'][-1], panel['high'][-1], panel['low'][-1], panel['close'][-1])
+    elapsed = time.perf_counter() - start
+    print(f'update: {elapsed * 10:.2f} ms per bar')
+
+    close = pd.DataFrame(panel['close'])
+    start = time.perf_counter()
+    for col in close.columns:
+        series = close[col]
+        series.rolling(20).mean(), series.rolling(50).mean(), series.rolling(200).mean()
+        series.ewm(span=12, adjust=False).mean(), series.ewm(span=26, adjust=False).mean()
+    elapsed = time.perf_counter() - start
+    print(f'pandas loop over symbols (sma and ema only): {elapsed * 1000:.0f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,10 @@
 from .pynse import *
+from .bars import BarAggregator
+from .screener import Screener
+from .indicators import IndicatorEngine, ohlcv_panel
+from .futures import ContinuousFutures
+from .cache import CacheManager
+from .eod import EodJob
+from .live import DataDaemon, NseClient
 
 __VERSION__ = '0.1.0'
\ No newline at end of file
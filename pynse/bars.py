@@ -0,0 +1,266 @@
+import datetime as dt
+import logging
+import os
+import pickle
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+class BarAggregator:
+    """
+    builds intraday OHLCV bars from polled snapshots of get_quote, stream_quotes and get_indices
+
+    bars are kept in preallocated ring buffers of history bars for every symbol,
+    so memory stays constant over the whole trading day.
+    every bar is written twice in a buffer of 2 * history rows, which keeps the latest
+    history bars contiguous and lets them be returned as views without copying.
+
+    volume of a bar is the change in cumulative traded volume between snapshots.
+    with a path, every bar is appended to the session file {date}.bars as soon as it completes,
+    so sessions longer than history bars are saved whole
+
+    Examples
+    --------
+
+    >>> bars = BarAggregator(nse.symbols['Nifty500'], bar_size=60, path=nse.data_root['intraday'])
+    >>> for quotes in nse.stream_quotes(['SBIN', 'INFY'], interval=30):
+    ...     bars.add_quotes(quotes)
+    >>> bars.bars('close')
+
+    """
+
+    fields = ('open', 'high', 'low', 'close', 'volume')
+
+    def __init__(self, symbols: list, bar_size: int = 60, history: int = 375, path: str = None):
+        """
+        :param symbols: symbols or index names to aggregate
+        :param bar_size: bar length in seconds
+        :param history: number of bars kept, including the current one
+        :param path: directory where sessions are saved, nothing is saved if None
+        """
+        if history < 2:
+            raise ValueError('history should be at least 2 bars')
+        self.symbols = list(symbols)
+        self.bar_size = int(bar_size)
+        self.history = int(history)
+        self.path = path
+        self.session = None
+        self.__columns = {s: i for i, s in enumerate(self.symbols)}
+        shape = (2 * self.history, len(self.symbols))
+        self.__buffers = {f: np.full(shape, np.nan) for f in self.fields}
+        self.__times = np.zeros(2 * self.history, dtype='datetime64[s]')
+        self.__cum_volume = np.full(len(self.symbols), np.nan)
+        self.__bar = None
+        self.__count = 0
+        self.__saved = None
+
+    def __reset(self):
+        for buffer in self.__buffers.values():
+            buffer.fill(np.nan)
+        self.__cum_volume.fill(np.nan)
+        self.__bar = None
+        self.__count = 0
+        self.__saved = None
+        self.session = None
+
+    def __flush(self, last):
+        """
+        append bars up to last not saved yet to the session file
+        bars are flushed before their rows are reused, so none is lost
+        """
+        if self.path is None or self.__bar is None:
+            return
+        first = self.__bar - min(self.__count, self.history) + 1
+        first = first if self.__saved is None else max(first, self.__saved + 1)
+        if last < first:
+            return
+        bars = np.arange(first, last + 1)
+        times = pd.DatetimeIndex((bars * self.bar_size).astype('datetime64[s]'))
+        index = pd.MultiIndex.from_product([times, self.symbols], names=['Date', 'symbol'])
+        frame = pd.DataFrame({f.capitalize(): self.__buffers[f][bars % self.history].ravel() for f in self.fields},
+                             index=index).dropna(subset=['Close'])
+        self.__saved = last
+        if frame.empty:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        filename = os.path.join(self.path, f'{self.session}.bars')
+        with open(filename, 'ab') as f:
+            pickle.dump(frame, f, protocol=pickle.HIGHEST_PROTOCOL)
+        logger.debug(f'saved {len(bars)} bars to {filename}')
+
+    def __open_bar(self, bar):
+        row = bar % self.history
+        for f, buffer in self.__buffers.items():
+            value = 0. if f == 'volume' else np.nan
+            buffer[row] = value
+            buffer[row + self.history] = value
+        self.__times[row] = self.__times[row + self.history] = np.datetime64(bar * self.bar_size, 's')
+        self.__count += 1
+
+    def __advance(self, timestamp):
+        """
+        move the current bar to the one containing timestamp
+        returns False if timestamp belongs to an older bar
+        """
+        if self.session is not None and timestamp.date() != self.session:
+            self.end_session()
+        bar = int(np.datetime64(timestamp, 's').astype(np.int64)) // self.bar_size
+        if self.__bar is None:
+            self.session = timestamp.date()
+            self.__open_bar(bar)
+        elif bar > self.__bar:
+            self.__flush(self.__bar)
+            # bars without any snapshot are kept empty
+            for b in range(max(self.__bar + 1, bar - self.history + 1), bar + 1):
+                self.__open_bar(b)
+        elif bar < self.__bar:
+            logger.debug(f'snapshot at {timestamp} is older than the current bar')
+            return False
+        self.__bar = bar
+        return True
+
+    def update(self, symbols, prices, volumes=None, timestamp: dt.datetime = None):
+        """
+        add one snapshot of many symbols taken at timestamp
+
+        :param symbols: list of symbols, unknown symbols are ignored
+        :param prices: last traded prices
+        :param volumes: cumulative traded volumes
+        """
+        timestamp = dt.datetime.now() if timestamp is None else timestamp
+        if not self.__advance(timestamp):
+            return
+        symbols = list(symbols)
+        known = np.array([s in self.__columns for s in symbols], dtype=bool)
+        cols = np.array([self.__columns[s] for s, k in zip(symbols, known) if k], dtype=np.intp)
+        prices = np.asarray(prices, dtype=float)[known]
+        valid = np.isfinite(prices)
+        cols, prices = cols[valid], prices[valid]
+        if volumes is not None:
+            volumes = np.asarray(volumes, dtype=float)[known][valid]
+
+        row = self.__bar % self.history
+        b = self.__buffers
+        first = np.isnan(b['open'][row, cols])
+        b['open'][row, cols[first]] = prices[first]
+        b['high'][row, cols] = np.fmax(b['high'][row, cols], prices)
+        b['low'][row, cols] = np.fmin(b['low'][row, cols], prices)
+        b['close'][row, cols] = prices
+        if volumes is not None:
+            previous = self.__cum_volume[cols]
+            delta = volumes - previous
+            # first snapshot of the session or a reset of the cumulative volume
+            delta = np.where(np.isnan(previous), 0., np.where(delta < 0, volumes, delta))
+            b['volume'][row, cols] += np.nan_to_num(delta)
+            self.__cum_volume[cols] = np.where(np.isnan(volumes), previous, volumes)
+        for buffer in b.values():
+            buffer[row + self.history, cols] = buffer[row, cols]
+
+    def add_quote(self, quote: dict):
+        """
+        add a quote returned by get_quote
+
+        >>> bars.add_quote(nse.get_quote('SBIN'))
+        """
+        volume = quote.get('totalTradedVolume') or quote.get('quantityTraded')
+        self.update([quote['symbol']], [quote['lastPrice']], None if volume is None else [volume], quote['timestamp'])
+
+    def add_quotes(self, quotes: list):
+        """
+        add a batch of compact quotes yielded by stream_quotes
+
+        >>> for quotes in nse.stream_quotes(['SBIN', 'INFY']):
+        ...     bars.add_quotes(quotes)
+        """
+        for quote in sorted(quotes, key=lambda q: q['timestamp']):
+            self.update([quote['symbol']], [quote['lastPrice']],
+                        None if quote.get('volume') is None else [quote['volume']], quote['timestamp'])
+
+    def add_indices(self, indices: pd.DataFrame, timestamp: dt.datetime = None):
+        """
+        add a snapshot returned by get_indices
+
+        >>> bars.add_indices(nse.get_indices())
+        """
+        self.update(indices.index, indices['last'].values, timestamp=timestamp)
+
+    def __rows(self, completed):
+        if self.__bar is None:
+            return slice(0, 0)
+        end = self.__bar % self.history + self.history + (0 if completed else 1)
+        length = min(self.__count, self.history) - (1 if completed else 0)
+        return slice(end - length, end)
+
+    def bars(self, field: str = 'close', completed: bool = False) -> np.ndarray:
+        """
+        view of the bars kept in the buffer as (bars x symbols), oldest first
+
+        the view is not copied and changes as new snapshots are added
+
+        :param completed: exclude the current bar
+        """
+        return self.__buffers[field][self.__rows(completed)]
+
+    def times(self, completed: bool = False) -> np.ndarray:
+        """
+        start time of the bars returned by bars
+        """
+        return self.__times[self.__rows(completed)]
+
+    def current(self) -> dict:
+        """
+        current bar as a dict of views with one value per symbol
+        """
+        if self.__bar is None:
+            return {f: self.__buffers[f][:0] for f in self.fields}
+        row = self.__bar % self.history + self.history
+        return {f: self.__buffers[f][row] for f in self.fields}
+
+    def to_frame(self, completed: bool = False) -> pd.DataFrame:
+        """
+        copy of the bars as a DataFrame indexed by (Date, symbol)
+        """
+        times = pd.DatetimeIndex(self.times(completed))
+        index = pd.MultiIndex.from_product([times, self.symbols], names=['Date', 'symbol'])
+        frame = pd.DataFrame({f.capitalize(): self.bars(f, completed).ravel() for f in self.fields}, index=index)
+        return frame.dropna(subset=['Close'])
+
+    def save(self):
+        """
+        append completed bars not saved yet to path/{date}.bars
+        bars are saved as they complete, the current bar is saved by end_session
+        """
+        if self.__bar is not None:
+            self.__flush(self.__bar - 1)
+
+    def end_session(self):
+        """
+        save the remaining bars including the current one and clear the buffers
+        called automatically when a snapshot of the next day arrives
+        """
+        if self.__bar is not None:
+            self.__flush(self.__bar)
+        self.__reset()
+
+    @staticmethod
+    def read(path: str, date: dt.date) -> pd.DataFrame:
+        """
+        read a saved session
+
+        >>> BarAggregator.read(nse.data_root['intraday'], dt.date(2020, 7, 20))
+        """
+        frames = list()
+        with open(os.path.join(path, f'{date}.bars'), 'rb') as f:
+            while True:
+                try:
+                    frames.append(pickle.load(f))
+                except (EOFError, pickle.UnpicklingError):
+                    # end of file or a partly written last chunk
+                    break
+        if not frames:
+            return pd.DataFrame(columns=[f.capitalize() for f in BarAggregator.fields])
+        frame = pd.concat(frames)
+        # a restarted aggregator may save the same bars again
+        return frame[~frame.index.duplicated(keep='last')]
@@ -0,0 +1,255 @@
+import contextlib
+import datetime as dt
+import logging
+import os
+import re
+import pandas as pd
+
+from .pynse import _atomic_write, _file_lock, _lock_file, _pack_file, _write_pack
+
+logger = logging.getLogger(__name__)
+
+# never removed, either needed to run or not available from nse again
+PROTECTED = ('config', 'symbol_list', 'locks', 'fii_dii', 'pre_open', 'intraday', 'live')
+
+# one file per day or intraday call, compacted into monthly packs
+COMPACTABLE = ('bhavcopy_eq', 'bhavcopy_fno', 'daily_delivery', 'eq_stock_watch', 'option_chain')
+
+# one store of records for every call, retention trims records by their date column instead of removing the file
+RANGE_STORES = {'insider_trading': ('insider_trading.pkl', 'date')}
+
+
+class CacheManager:
+    """
+    retention, size budget and compaction for the data_root cache tree
+
+    entries are tracked in a small index (path, kind, size, last access, date) kept in the config folder,
+    once an index is saved, files written or read by Nse are appended to a journal replayed into the index,
+    the tree is only walked when no index is saved or by scan.
+    retention removes entries of a kind older than a number of days, or the records older than that from the
+    store of a kind in RANGE_STORES, the budget then evicts the least recently used entries until the tree fits.
+    compaction moves daily and intraday files of past months into one packed_{YYYY-MM}.zip per folder,
+    Nse still reads them from there transparently.
+
+    Examples
+    --------
+
+    >>> cache = CacheManager(nse, budget=5 * 2 ** 30, retention={'option_chain': 30, 'insider_trading': 100})
+    >>> cache.compact()
+    >>> cache.enforce()
+    >>> cache.usage()
+
+    """
+
+    def __init__(self, nse, budget: int = None, retention: dict = None):
+        """
+        :param budget: maximum size of the cache tree in bytes, no limit if None
+        :param retention: dict of kind (data_root key) and days to keep
+        """
+        self.nse = nse
+        self.budget = budget
+        self.retention = dict() if retention is None else dict(retention)
+        self.index_file = f"{nse.data_root['config']}cache_index.pkl"
+        self.journal = f"{nse.data_root['config']}cache_journal"
+
+    @staticmethod
+    def __date(name, mtime):
+        packed = re.match(r'packed_(\d{4})-(\d{2})\.zip$', name)
+        if packed is not None:
+            month = dt.date(int(packed.group(1)), int(packed.group(2)), 1)
+            return (pd.Timestamp(month) + pd.offsets.MonthEnd(0)).date()
+        dated = re.match(r'(?:.*_)?(\d{4}-\d{2}-\d{2})[_.]', name)
+        if dated is not None:
+            return dt.datetime.strptime(dated.group(1), '%Y-%m-%d').date()
+        return dt.date.fromtimestamp(mtime)
+
+    def __kind(self, filename):
+        kinds = [k for k, p in self.nse.data_root.items() if k != 'data_root' and filename.startswith(p)]
+        return max(kinds, key=lambda k: len(self.nse.data_root[k]), default=None)
+
+    def __save(self, index):
+        _atomic_write(self.index_file, lambda tmp: index.to_pickle(tmp))
+
+    def __lock(self):
+        """
+        lock held while the index is read, updated and saved
+        """
+        return _file_lock(_lock_file(self.nse.data_root, self.index_file))
+
+    def scan(self) -> pd.DataFrame:
+        """
+        walk the cache tree and save the index
+        """
+        with self.__lock():
+            return self.__scan()
+
+    def __scan(self):
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self.journal)
+        rows = list()
+        for kind, path in self.nse.data_root.items():
+            if kind == 'data_root' or not os.path.isdir(path):
+                continue
+            for root, _, files in os.walk(path):
+                for name in files:
+                    if name.startswith('.tmp_'):
+                        continue
+                    filename = os.path.join(root, name)
+                    try:
+                        st = os.stat(filename)
+                    except FileNotFoundError:
+                        continue
+                    rows.append((filename, kind, st.st_size, st.st_atime, self.__date(name, st.st_mtime)))
+        index = pd.DataFrame(rows, columns=['path', 'kind', 'size', 'atime', 'date'])
+        self.__save(index)
+        return index
+
+    def index(self) -> pd.DataFrame:
+        """
+        saved index updated with the files written or read since, scans the tree if no index is saved
+        """
+        with self.__lock():
+            return self.__replay()
+
+    def __replay(self):
+        """
+        read the index and replay the journal into it, called with the index lock held
+        """
+        if not os.path.exists(self.index_file):
+            return self.__scan()
+        index = pd.read_pickle(self.index_file)
+        replay = f'{self.journal}.replay'
+        # a replay left by an interrupted call is read before the journal
+        if not os.path.exists(replay):
+            with contextlib.suppress(FileNotFoundError):
+                os.replace(self.journal, replay)
+        if not os.path.exists(replay):
+            return index
+        accessed = dict()
+        with open(replay) as f:
+            for line in f:
+                filename, _, atime = line.rstrip('\n').rpartition('\t')
+                with contextlib.suppress(ValueError):
+                    accessed[filename] = max(float(atime), accessed.get(filename, 0.))
+        rows = list()
+        for filename, atime in accessed.items():
+            kind = self.__kind(filename)
+            try:
+                st = os.stat(filename)
+            except FileNotFoundError:
+                continue
+            if kind is not None:
+                name = os.path.basename(filename)
+                rows.append((filename, kind, st.st_size, atime, self.__date(name, st.st_mtime)))
+        index = pd.concat([index[~index['path'].isin(accessed)], pd.DataFrame(rows, columns=index.columns)],
+                          ignore_index=True)
+        self.__save(index)
+        os.remove(replay)
+        return index
+
+    def usage(self) -> pd.DataFrame:
+        """
+        number of files and bytes used by every kind
+        """
+        return self.index().groupby('kind')['size'].agg(['count', 'sum'])
+
+    def __remove(self, filename):
+        with _file_lock(_lock_file(self.nse.data_root, filename)):
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(filename)
+        logger.debug(f'removed {filename}')
+
+    def __trim(self, kind, before):
+        """
+        drop records dated before a day from a range store and shorten its covered intervals
+        """
+        name, date_column = RANGE_STORES[kind]
+        filename = f'{self.nse.data_root[kind]}{name}'
+        with _file_lock(_lock_file(self.nse.data_root, filename)):
+            if not os.path.exists(filename):
+                return
+            store = pd.read_pickle(filename)
+            data = store['data']
+            if not data.empty:
+                dates = pd.to_datetime(data[date_column], dayfirst=True, errors='coerce').dt.normalize()
+                data = data[dates >= pd.Timestamp(before)].reset_index(drop=True)
+            intervals = [(max(lo, before), hi) for lo, hi in store['intervals'] if hi >= before]
+            if len(data) == len(store['data']) and intervals == store['intervals']:
+                return
+            store = {'intervals': intervals, 'data': data}
+            _atomic_write(filename, lambda tmp: pd.to_pickle(store, tmp))
+        logger.debug(f'trimmed {filename} to {before}')
+
+    def enforce(self, today: dt.date = None) -> list:
+        """
+        apply retention then evict least recently used entries over the budget
+        returns removed files
+        """
+        today = dt.date.today() if today is None else today
+        for kind, days in self.retention.items():
+            if kind in PROTECTED:
+                raise ValueError(f'{kind} can not be removed')
+            if kind in RANGE_STORES:
+                self.__trim(kind, today - dt.timedelta(days=days))
+        with self.__lock():
+            # trimmed stores are in the journal, so the index has their new size
+            index = self.__replay()
+            expired = pd.Series(False, index=index.index)
+            for kind, days in self.retention.items():
+                if kind not in RANGE_STORES:
+                    expired |= (index['kind'] == kind) & (index['date'] < today - dt.timedelta(days=days))
+            evicted = pd.Series(False, index=index.index)
+            if self.budget is not None:
+                excess = index.loc[~expired, 'size'].sum() - self.budget
+                if excess > 0:
+                    candidates = index[~expired & ~index['kind'].isin(PROTECTED)].sort_values('atime')
+                    freed = candidates['size'].cumsum()
+                    # smallest number of oldest entries freeing at least the excess
+                    evicted[candidates.index[(freed - candidates['size']) < excess]] = True
+                    if freed.empty or freed.iloc[-1] < excess:
+                        logger.warning('budget can not be met without removing protected data')
+            removed = list(index.loc[expired | evicted, 'path'])
+            for filename in removed:
+                self.__remove(filename)
+            if removed:
+                self.__save(index[~index['path'].isin(removed)])
+        logger.info(f'removed {len(removed)} files from cache')
+        return removed
+
+    def __folders(self, kind):
+        path = self.nse.data_root[kind]
+        if kind == 'option_chain':
+            return [os.path.join(path, d) for d in os.listdir(path) if os.path.isdir(os.path.join(path, d))]
+        return [path]
+
+    def compact(self, before: dt.date = None) -> int:
+        """
+        move dated files older than before (default the first day of the current month)
+        into monthly packs, returns the number of files packed
+        """
+        before = dt.date.today().replace(day=1) if before is None else before
+        packed = list()
+        for kind in COMPACTABLE:
+            for folder in self.__folders(kind):
+                groups = dict()
+                for name in os.listdir(folder):
+                    if not name.endswith('.pkl') or name.startswith('.tmp_'):
+                        continue
+                    filename = os.path.join(folder, name)
+                    pack = _pack_file(filename)
+                    if pack is None or self.__date(name, 0) >= before:
+                        continue
+                    groups.setdefault(pack, list()).append(name)
+                for pack, names in groups.items():
+                    with _file_lock(_lock_file(self.nse.data_root, pack)):
+                        _write_pack(pack, [os.path.join(folder, name) for name in names])
+                    for name in names:
+                        self.__remove(os.path.join(folder, name))
+                        packed.append(os.path.join(folder, name))
+                    logger.debug(f'packed {len(names)} files into {pack}')
+        if packed:
+            # packs are in the journal, only the packed files are dropped from the index
+            with self.__lock():
+                index = self.__replay()
+                self.__save(index[~index['path'].isin(packed)])
+        return len(packed)
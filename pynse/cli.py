@@ -0,0 +1,62 @@
+import argparse
+import datetime as dt
+import logging
+import os
+
+from .pynse import Nse
+from .eod import EOD_TASKS, EodJob
+from .live import DataDaemon
+
+
+def main(argv=None):
+    """
+    pynse console entry point
+
+    Examples
+    --------
+
+    $ pynse eod --path ~/pynse
+    $ pynse eod --path ~/pynse --tasks bhavcopy daily_delivery --date 2020-07-20
+    $ pynse eod --path ~/pynse --status
+    $ pynse daemon --path ~/pynse --symbols SBIN INFY --option-chains NIFTY BANKNIFTY
+
+    """
+    parser = argparse.ArgumentParser(prog='pynse', description='download data from NSE')
+    commands = parser.add_subparsers(dest='command')
+    eod = commands.add_parser('eod', help='download end of day data, only failed or missing tasks when run again')
+    eod.add_argument('--path', default='data', help='data folder, same as Nse(path=...)')
+    eod.add_argument('--date', type=lambda s: dt.datetime.strptime(s, '%Y-%m-%d').date(),
+                     help='trading date as YYYY-MM-DD, latest trading day by default')
+    eod.add_argument('--tasks', nargs='+', choices=list(EOD_TASKS) + ['option_chain'], help='tasks to run')
+    eod.add_argument('--symbols', nargs='+', help='underlyings for option chains, every F&O symbol by default')
+    eod.add_argument('--workers', type=int, default=4, help='tasks running at the same time')
+    eod.add_argument('--restart', action='store_true', help='run every task again')
+    eod.add_argument('--status', action='store_true', help='print the report of the last run')
+    eod.add_argument('-v', '--verbose', action='store_true', help='debug logging')
+    daemon = commands.add_parser('daemon', help='poll live data once and publish it to every NseClient')
+    daemon.add_argument('--path', default='data', help='data folder, same as Nse(path=...)')
+    daemon.add_argument('--symbols', nargs='+', default=[], help='symbols to publish quotes of')
+    daemon.add_argument('--option-chains', nargs='+', default=[], help='underlyings to publish option chains of')
+    daemon.add_argument('--no-indices', action='store_true', help='do not publish index values')
+    daemon.add_argument('--interval', type=float, default=60, help='seconds between polls')
+    daemon.add_argument('-v', '--verbose', action='store_true', help='debug logging')
+    args = parser.parse_args(argv)
+    if args.command is None:
+        parser.print_help()
+        return 2
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                        format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    nse = Nse(path=os.path.abspath(os.path.expanduser(args.path)))
+    if args.command == 'daemon':
+        try:
+            DataDaemon(nse, symbols=args.symbols, option_chains=args.option_chains, indices=not args.no_indices,
+                       interval=args.interval).run()
+        except KeyboardInterrupt:
+            pass
+        return 0
+    job = EodJob(nse, date=args.date, tasks=args.tasks, symbols=args.symbols, workers=args.workers)
+    report = job.report() if args.status else job.run(restart=args.restart)
+    print(report.to_string())
+    # tasks are only skipped when a dependency failed or for latest day data of an earlier date
+    return 0 if report['status'].isin(['done', 'skipped']).all() else 1
@@ -0,0 +1,153 @@
+import concurrent.futures
+import datetime as dt
+import json
+import logging
+import os
+import time
+import pandas as pd
+
+from .pynse import _atomic_write, _file_lock, _lock_file
+
+logger = logging.getLogger(__name__)
+
+# name: (tasks it depends on, callable taking nse and the trading date)
+EOD_TASKS = {
+    'bhavcopy': ((), lambda nse, date: nse.bhavcopy(date)),
+    'bhavcopy_fno': ((), lambda nse, date: nse.bhavcopy_fno(date)),
+    'daily_delivery': ((), lambda nse, date: nse.daily_delivery(date)),
+    'eq_stock_watch': ((), lambda nse, date: nse.eq_stock_watch()),
+    'fii_dii': ((), lambda nse, date: nse.fii_dii()),
+    'symbol_list': (('bhavcopy',), lambda nse, date: nse.update_symbol_list()),
+}
+
+# only published for the latest day, skipped when the job runs for an earlier date
+LATEST_ONLY = ('eq_stock_watch', 'fii_dii', 'option_chain')
+
+
+class EodJob:
+    """
+    resumable end of day download
+
+    tasks form a small graph, a task starts once the tasks it depends on are done and independent
+    tasks run together on a thread pool, sharing the rate limit of nse.
+    status and time of every task are saved in the eod folder as soon as it finishes,
+    running the job again for the same date only runs the tasks that failed or never ran.
+
+    one option_chain:{symbol} task is added for every F&O underlying. tasks in LATEST_ONLY are skipped
+    for dates before the latest trading day, nse only serves their current values
+
+    Examples
+    --------
+
+    >>> job = EodJob(nse)
+    >>> job.run()
+    >>> job.report()
+
+    """
+
+    def __init__(self, nse, date: dt.date = None, tasks: list = None, symbols: list = None, workers: int = 4):
+        """
+        :param date: trading date, latest trading day if None, looked up when the job runs
+        :param tasks: names in EOD_TASKS and 'option_chain', every task if None
+        :param symbols: underlyings for option chains, every F&O symbol if None
+        :param workers: number of tasks running at the same time
+        """
+        self.nse = nse
+        self.date = date
+        self.workers = workers
+        tasks = list(EOD_TASKS) + ['option_chain'] if tasks is None else list(tasks)
+        self.graph = {name: EOD_TASKS[name] for name in tasks if name != 'option_chain'}
+        if 'option_chain' in tasks:
+            symbols = nse.symbols['FnO'] if symbols is None else symbols
+            for symbol in symbols:
+                self.graph[f'option_chain:{symbol}'] = ((), lambda nse, date, symbol=symbol: nse.option_chain(symbol))
+
+    @property
+    def filename(self):
+        return f"{self.nse.data_root['eod']}{self.date}.json"
+
+    def __latest_run(self):
+        """
+        date of the last saved run, None if the job never ran
+        """
+        runs = sorted(name[:-5] for name in os.listdir(self.nse.data_root['eod']) if name.endswith('.json'))
+        return dt.datetime.strptime(runs[-1], '%Y-%m-%d').date() if runs else None
+
+    def __load(self):
+        if self.date is None or not os.path.exists(self.filename):
+            return dict()
+        with open(self.filename) as f:
+            return json.load(f)
+
+    def __save(self, state):
+        def write(tmp):
+            with open(tmp, 'w') as f:
+                json.dump(state, f, indent=1)
+
+        with _file_lock(_lock_file(self.nse.data_root, self.filename)):
+            _atomic_write(self.filename, write)
+
+    def __run_task(self, name):
+        start = time.perf_counter()
+        try:
+            self.graph[name][1](self.nse, self.date)
+        except Exception as e:
+            logger.error(f'{name} failed: {e!r}')
+            status, error = 'failed', repr(e)
+        else:
+            status, error = 'done', None
+        seconds = round(time.perf_counter() - start, 3)
+        logger.info(f'{name} {status} in {seconds}s')
+        return {'status': status, 'seconds': seconds, 'error': error,
+                'finished': dt.datetime.now().isoformat(timespec='seconds')}
+
+    def run(self, restart: bool = False) -> pd.DataFrame:
+        """
+        run tasks not done yet for the date and return the report
+
+        :param restart: run every task again
+        """
+        latest = self.nse.trading_calendar(dt.date.today() - dt.timedelta(days=10))[-1]
+        self.date = latest if self.date is None else self.date
+        state = dict() if restart else self.__load()
+        pending = [name for name in self.graph if state.get(name, {}).get('status') != 'done']
+        for name in pending:
+            state.pop(name, None)
+            if self.date != latest and name.split(':')[0] in LATEST_ONLY:
+                state[name] = {'status': 'skipped', 'seconds': 0., 'error': f'only published for {latest}',
+                               'finished': dt.datetime.now().isoformat(timespec='seconds')}
+        pending = [name for name in pending if name not in state]
+        logger.info(f'{len(pending)} of {len(self.graph)} tasks to run for {self.date}')
+        running = dict()
+        with concurrent.futures.ThreadPoolExecutor(self.workers) as pool:
+            while pending or running:
+                for name in list(pending):
+                    # dependencies outside the graph are not waited for
+                    deps = [state.get(d, {}).get('status') for d in self.graph[name][0] if d in self.graph]
+                    if any(s in ('failed', 'skipped') for s in deps):
+                        state[name] = {'status': 'skipped', 'seconds': 0., 'error': 'dependency failed',
+                                       'finished': dt.datetime.now().isoformat(timespec='seconds')}
+                        pending.remove(name)
+                    elif all(s == 'done' for s in deps):
+                        running[pool.submit(self.__run_task, name)] = name
+                        pending.remove(name)
+                if not running:
+                    continue
+                done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    state[running.pop(future)] = future.result()
+                self.__save(state)
+        self.__save(state)
+        return self.report(state)
+
+    def report(self, state: dict = None) -> pd.DataFrame:
+        """
+        status, seconds, error and finish time of every task
+        the last saved run is reported if the job has no date and has not run yet
+        """
+        self.date = self.__latest_run() if self.date is None else self.date
+        state = self.__load() if state is None else state
+        rows = [dict({'status': 'pending', 'seconds': None, 'error': None, 'finished': None}, **state.get(name, {}))
+                for name in self.graph]
+        return pd.DataFrame(rows, index=pd.Index(list(self.graph), name='task'),
+                            columns=['status', 'seconds', 'error', 'finished'])
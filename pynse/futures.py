@@ -0,0 +1,200 @@
+import datetime as dt
+import logging
+import os
+import numpy as np
+import pandas as pd
+
+from .pynse import _atomic_write, _record
+
+logger = logging.getLogger(__name__)
+
+# bhavcopy_fno column for every field
+FUTURES_FIELDS = {'open': 'OPEN', 'high': 'HIGH', 'low': 'LOW', 'close': 'CLOSE', 'settle': 'SETTLE_PR',
+                  'contracts': 'CONTRACTS', 'oi': 'OPEN_INT', 'chg_oi': 'CHG_IN_OI'}
+
+# contracts by expiry, nearest first
+MONTHS = ('front', 'next', 'far')
+
+
+class ContinuousFutures:
+    """
+    continuous front and next month futures, OI rollover and calendar spreads for every F&O symbol
+
+    futures rows of every bhavcopy_fno in the range are collected once into a single table,
+    contracts are ranked by expiry for every day and symbol, and every (month, field) pair is
+    spread into a (date x symbol) panel, all without grouping in python.
+    the table is saved in the futures folder, update only reads days added since the last run.
+
+    Examples
+    --------
+
+    >>> futures = ContinuousFutures(nse)
+    >>> futures.build(dt.date(2020, 1, 1), dt.date(2020, 6, 30))
+    >>> futures.continuous('close')
+    >>> futures.rollover()
+    >>> futures.update()
+
+    """
+
+    def __init__(self, nse):
+        self.nse = nse
+        self.filename = f"{nse.data_root['futures']}futures.pkl"
+        self.table = pd.DataFrame()
+        self.dates = pd.DatetimeIndex([])
+        self.symbols = pd.Index([])
+        self.panels = dict()
+        if os.path.exists(self.filename):
+            self.table = pd.read_pickle(self.filename)
+            _record(self.filename)
+            self.__spread()
+
+    @staticmethod
+    def __futures(bhavcopy, date):
+        futures = bhavcopy[bhavcopy['INSTRUMENT'].isin(['FUTSTK', 'FUTIDX'])]
+        table = pd.DataFrame({f: futures[c].values for f, c in FUTURES_FIELDS.items() if c in futures.columns})
+        table['symbol'] = futures.index.values
+        table['expiry'] = pd.to_datetime(futures['EXPIRY_DT'].values)
+        table['date'] = pd.Timestamp(date)
+        return table
+
+    def __read(self, dates):
+        frames = [self.__futures(self.nse.bhavcopy_fno(date), date) for date in dates]
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    def __save(self):
+        table = self.table
+        _atomic_write(self.filename, lambda tmp: table.to_pickle(tmp))
+        logger.debug(f'saved {self.filename}')
+
+    def build(self, from_date: dt.date, to_date: dt.date = None, download: bool = False):
+        """
+        build the series from every bhavcopy_fno between from_date and to_date
+
+        :param download: download missing bhavcopies, otherwise only days already on disk are used
+        """
+        to_date = dt.date.today() if to_date is None else to_date
+        if download:
+            cached = set(self.nse.cached_dates('bhavcopy_fno', from_date, to_date))
+            missing = [date for date in self.nse.trading_calendar(from_date, to_date) if date not in cached]
+            for _ in self.nse.bulk('bhavcopy_fno', missing):
+                pass
+        dates = self.nse.cached_dates('bhavcopy_fno', from_date, to_date)
+        if not dates:
+            raise FileNotFoundError(f'no bhavcopy_fno between {from_date} and {to_date}')
+        self.table = self.__read(dates)
+        self.__save()
+        self.__spread()
+        return self
+
+    def update(self, to_date: dt.date = None, download: bool = False):
+        """
+        add only the days after the last one already processed
+        """
+        if self.table.empty:
+            raise ValueError('nothing built yet, call build first')
+        last = self.table['date'].max().date()
+        to_date = dt.date.today() if to_date is None else to_date
+        if download and last < to_date:
+            cached = set(self.nse.cached_dates('bhavcopy_fno', last + dt.timedelta(1), to_date))
+            missing = [date for date in self.nse.trading_calendar(last + dt.timedelta(1), to_date) if date not in cached]
+            for _ in self.nse.bulk('bhavcopy_fno', missing):
+                pass
+        dates = self.nse.cached_dates('bhavcopy_fno', last + dt.timedelta(1), to_date)
+        if dates:
+            self.table = pd.concat([self.table, self.__read(dates)], ignore_index=True)
+            self.__save()
+            self.__spread()
+            logger.debug(f'added {len(dates)} days')
+        return self
+
+    def __spread(self):
+        """
+        rank contracts by expiry and spread them into (date x symbol) panels
+        """
+        if self.table.empty:
+            self.dates, self.symbols, self.panels = pd.DatetimeIndex([]), pd.Index([]), dict()
+            return
+        table = self.table.sort_values(['date', 'symbol', 'expiry'], kind='mergesort')
+        rank = table.groupby(['date', 'symbol'], sort=False).cumcount().values
+        self.dates = pd.DatetimeIndex(sorted(table['date'].unique()))
+        self.symbols = pd.Index(sorted(table['symbol'].unique()))
+        rows = self.dates.get_indexer(table['date'])
+        cols = self.symbols.get_indexer(table['symbol'])
+        shape = (len(self.dates), len(self.symbols))
+        self.panels = dict()
+        for month_rank, month in enumerate(MONTHS):
+            selected = rank == month_rank
+            r, c = rows[selected], cols[selected]
+            for f in list(FUTURES_FIELDS) + ['expiry']:
+                if f not in table.columns:
+                    continue
+                panel = np.full(shape, np.datetime64('NaT'), dtype='datetime64[ns]') if f == 'expiry' \
+                    else np.full(shape, np.nan)
+                panel[r, c] = table[f].values[selected]
+                self.panels[(month, f)] = panel
+
+    def __frame(self, values):
+        return pd.DataFrame(values, index=self.dates, columns=self.symbols)
+
+    def front(self, field: str = 'close') -> pd.DataFrame:
+        """
+        nearest expiry contract
+        """
+        return self.__frame(self.panels[('front', field)])
+
+    def next(self, field: str = 'close') -> pd.DataFrame:
+        """
+        second nearest expiry contract
+        """
+        return self.__frame(self.panels[('next', field)])
+
+    def spread(self, field: str = 'close') -> pd.DataFrame:
+        """
+        calendar spread, next month minus front month
+        """
+        return self.__frame(self.panels[('next', field)] - self.panels[('front', field)])
+
+    def rollover(self) -> pd.DataFrame:
+        """
+        percentage of open interest in next and far month contracts
+        """
+        oi = {m: np.nan_to_num(self.panels[(m, 'oi')]) for m in MONTHS}
+        total = oi['front'] + oi['next'] + oi['far']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return self.__frame(np.where(total > 0, (oi['next'] + oi['far']) / total * 100., np.nan))
+
+    def rolls(self) -> pd.DataFrame:
+        """
+        True on the days the front month contract changed
+        """
+        expiry = self.panels[('front', 'expiry')]
+        rolled = np.zeros(expiry.shape, dtype=bool)
+        rolled[1:] = (expiry[1:] != expiry[:-1]) & ~np.isnat(expiry[1:]) & ~np.isnat(expiry[:-1])
+        return self.__frame(rolled)
+
+    def continuous(self, field: str = 'close', adjust: str = 'backward') -> pd.DataFrame:
+        """
+        front month series stitched at every roll
+
+        :param adjust: 'backward' shifts older prices by the spread on the day before each roll,
+            'ratio' scales them by the ratio, None keeps the raw front month prices
+        """
+        front = self.panels[('front', field)]
+        if adjust is None:
+            return self.__frame(front.copy())
+        rolled = self.rolls().values
+        previous_front = np.vstack([np.full((1, front.shape[1]), np.nan), front[:-1]])
+        previous_next = np.vstack([np.full((1, front.shape[1]), np.nan), self.panels[('next', field)][:-1]])
+        # adjustment of a row is the combined effect of every roll after it
+        if adjust == 'backward':
+            gap = np.where(rolled, np.nan_to_num(previous_next - previous_front), 0.)
+            after = np.cumsum(gap[::-1], axis=0)[::-1]
+            return self.__frame(front + np.vstack([after[1:], np.zeros((1, front.shape[1]))]))
+        elif adjust == 'ratio':
+            with np.errstate(divide='ignore', invalid='ignore'):
+                ratio = np.where(rolled, previous_next / previous_front, 1.)
+            ratio = np.where(np.isfinite(ratio), ratio, 1.)
+            after = np.cumprod(ratio[::-1], axis=0)[::-1]
+            return self.__frame(front * np.vstack([after[1:], np.ones((1, front.shape[1]))]))
+        else:
+            raise ValueError(f'unknown adjustment {adjust}')
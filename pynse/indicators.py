@@ -0,0 +1,345 @@
+import logging
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# rows handled by one matrix product in _ewm
+_EWM_BLOCK = 64
+
+
+def shift(x, n=1):
+    """
+    value n rows earlier, nan for the first n rows
+    """
+    x = np.asarray(x, dtype=float)
+    out = np.full_like(x, np.nan)
+    if n < len(x):
+        out[n:] = x[:len(x) - n]
+    return out
+
+
+def pct_change(x, n=1):
+    """
+    percentage change over n rows
+    """
+    x = np.asarray(x, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (x / shift(x, n) - 1.) * 100.
+
+
+def sma(x, n):
+    """
+    simple moving average over n rows of every column
+    nan if any value in the window is missing
+    """
+    x = np.asarray(x, dtype=float)
+    out = np.full_like(x, np.nan)
+    if n > len(x):
+        return out
+    valid = np.isfinite(x)
+    total = np.cumsum(np.where(valid, x, 0.), axis=0)
+    window = total[n - 1:]
+    window[1:] -= total[:-n]
+    out[n - 1:] = window / n
+    if not valid.all():
+        count = np.cumsum(valid, axis=0, dtype=np.int32)
+        full = count[n - 1:]
+        full[1:] -= count[:-n]
+        out[n - 1:][full < n] = np.nan
+    return out
+
+
+def _windows(x, n):
+    """
+    (rows - n + 1, n, ...) view of all windows of n rows, nothing is copied
+    """
+    x = np.ascontiguousarray(x, dtype=float)
+    shape = (len(x) - n + 1, n) + x.shape[1:]
+    strides = (x.strides[0],) + x.strides
+    return np.lib.stride_tricks.as_strided(x, shape=shape, strides=strides, writeable=False)
+
+
+def rolling_max(x, n):
+    """
+    highest value over n rows of every column
+    """
+    x = np.asarray(x, dtype=float)
+    out = np.full_like(x, np.nan)
+    if n <= len(x):
+        out[n - 1:] = _windows(x, n).max(axis=1)
+    return out
+
+
+def rolling_min(x, n):
+    """
+    lowest value over n rows of every column
+    """
+    x = np.asarray(x, dtype=float)
+    out = np.full_like(x, np.nan)
+    if n <= len(x):
+        out[n - 1:] = _windows(x, n).min(axis=1)
+    return out
+
+
+def _ffill(x):
+    """
+    forward fill nan along rows, leading nan are kept
+    """
+    x = np.asarray(x, dtype=float)
+    rows = np.arange(len(x)).reshape((-1,) + (1,) * (x.ndim - 1))
+    last = np.maximum.accumulate(np.where(np.isfinite(x), rows, 0), axis=0)
+    return np.take_along_axis(x, last, axis=0)
+
+
+def _ewm(x, alpha):
+    """
+    y[t] = alpha * x[t] + (1 - alpha) * y[t - 1] for every column, seeded with the first valid value
+
+    the recursion is unrolled over blocks of rows: within a block y is a lower triangular
+    matrix of decay weights times x plus the decayed last value of the previous block,
+    so the only python loop is over blocks and the decay powers stay small.
+    x should not have nan after the first valid value of a column
+    """
+    x = np.asarray(x, dtype=float)
+    shape = x.shape
+    x = x.reshape(len(x), -1)
+    out = np.full_like(x, np.nan)
+    valid = np.isfinite(x)
+    started = valid.any(axis=0)
+    if not len(x) or not started.any():
+        return out.reshape(shape)
+    first = valid.argmax(axis=0)
+    cols = np.arange(x.shape[1])
+    # rows before the first value are replaced by it, so y is equal to it there
+    x = np.where(np.arange(len(x))[:, None] < first, x[first, cols], x)
+    x = np.where(started, x, 0.)
+
+    decay = 1. - alpha
+    lag = np.subtract.outer(np.arange(_EWM_BLOCK), np.arange(_EWM_BLOCK))
+    weights = np.where(lag >= 0, alpha * decay ** np.maximum(lag, 0), 0.)
+    carry = decay ** np.arange(1, _EWM_BLOCK + 1)
+    previous = x[0]
+    for start in range(0, len(x), _EWM_BLOCK):
+        block = x[start:start + _EWM_BLOCK]
+        n = len(block)
+        out[start:start + n] = weights[:n, :n] @ block + carry[:n, None] * previous
+        previous = out[start + n - 1]
+    out[np.arange(len(x))[:, None] < first] = np.nan
+    out[:, ~started] = np.nan
+    return out.reshape(shape)
+
+
+def ema(x, n):
+    """
+    exponential moving average with span n, same as pandas ewm(span=n, adjust=False)
+    gaps are forward filled
+    """
+    return _ewm(_ffill(x), 2. / (n + 1.))
+
+
+def rsi(close, n=14):
+    """
+    relative strength index with Wilder smoothing
+    """
+    close = _ffill(close)
+    delta = close - shift(close)
+    gain = _ewm(np.where(np.isnan(delta), np.nan, np.maximum(delta, 0.)), 1. / n)
+    loss = _ewm(np.where(np.isnan(delta), np.nan, np.maximum(-delta, 0.)), 1. / n)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return 100. - 100. / (1. + gain / loss)
+
+
+def true_range(high, low, close):
+    """
+    true range, high - low on the first row
+    """
+    high, low, close = _ffill(high), _ffill(low), _ffill(close)
+    previous = shift(close)
+    return np.fmax(high - low, np.fmax(np.abs(high - previous), np.abs(low - previous)))
+
+
+def atr(high, low, close, n=14):
+    """
+    average true range with Wilder smoothing
+    """
+    return _ewm(true_range(high, low, close), 1. / n)
+
+
+def bollinger(close, n=20, k=2.):
+    """
+    bollinger bands as (middle, upper, lower), standard deviation of the population
+    """
+    close = np.asarray(close, dtype=float)
+    middle = sma(close, n)
+    std = np.full_like(close, np.nan)
+    if n <= len(close):
+        windows = _windows(close, n)
+        # every window centred on its own mean so the squares do not lose precision,
+        # in blocks of rows to bound the temporary arrays
+        for start in range(0, len(windows), 256):
+            block = windows[start:start + 256]
+            deviation = block - block.mean(axis=1, keepdims=True)
+            std[n - 1 + start:n - 1 + start + len(block)] = np.sqrt((deviation ** 2).mean(axis=1))
+    return middle, middle + k * std, middle - k * std
+
+
+def ohlcv_panel(hists: dict) -> dict:
+    """
+    (date x symbol) panel from get_hist results
+
+    :param hists: dict of symbol and the DataFrame returned by get_hist
+    :returns dict with dates, symbols and one array for each of open, high, low, close and volume
+
+    Examples
+    --------
+
+    >>> panel = ohlcv_panel({s: nse.get_hist(s) for s in ['SBIN', 'INFY']})
+
+    """
+    columns = {'open': 'Open', 'high': 'High', 'low': 'Low', 'close': 'Close', 'volume': 'Volume'}
+    panel = dict()
+    for f, c in columns.items():
+        # index history has SharesTraded in place of Volume
+        frame = pd.concat({s: h[c] if c in h.columns else h['SharesTraded'] for s, h in hists.items()},
+                          axis=1).sort_index()
+        frame = frame[~frame.index.duplicated(keep='last')]
+        panel[f] = frame.values.astype(float)
+    panel['dates'] = frame.index
+    panel['symbols'] = frame.columns
+    return panel
+
+
+class IndicatorEngine:
+    """
+    technical indicators for a whole (date x symbol) panel
+
+    compute runs every indicator over the panel with vectorized kernels, update takes one new
+    bar for every symbol and moves all indicators forward from their last state without
+    recomputing the history.
+
+    Examples
+    --------
+
+    >>> engine = IndicatorEngine(ohlcv_panel(hists), sma=(20, 50), rsi=(14,))
+    >>> engine.compute()['rsi_14']
+    >>> engine.update(open, high, low, close, volume)['rsi_14']
+
+    """
+
+    def __init__(self, panel: dict, sma: tuple = (20,), ema: tuple = (20,), rsi: tuple = (14,), atr: tuple = (14,),
+                 bollinger: tuple = ((20, 2.),)):
+        self.panel = panel
+        self.periods = {'sma': tuple(sma), 'ema': tuple(ema), 'rsi': tuple(rsi), 'atr': tuple(atr),
+                        'bollinger': tuple(bollinger)}
+        self.__results = dict()
+        self.__length = 0
+        self.__state = dict()
+        window = max([n for n in self.periods['sma']] + [n for n, _ in self.periods['bollinger']] + [1])
+        self.__window = np.full((window, len(panel['symbols'])), np.nan)
+        self.__position = 0
+
+    def __store(self, name, values):
+        capacity = len(values) + 256
+        self.__results[name] = np.full((capacity,) + values.shape[1:], np.nan)
+        self.__results[name][:len(values)] = values
+
+    def __append(self, name, row):
+        storage = self.__results[name]
+        if self.__length == len(storage):
+            grown = np.full((2 * len(storage),) + storage.shape[1:], np.nan)
+            grown[:len(storage)] = storage
+            self.__results[name] = storage = grown
+        storage[self.__length] = row
+
+    def compute(self) -> dict:
+        """
+        every indicator over the whole panel, keyed like sma_20, rsi_14, bb_upper_20
+        """
+        p = self.panel
+        high, low, close = _ffill(p['high']), _ffill(p['low']), _ffill(p['close'])
+        for n in self.periods['sma']:
+            self.__store(f'sma_{n}', sma(p['close'], n))
+        for n in self.periods['ema']:
+            self.__store(f'ema_{n}', _ewm(close, 2. / (n + 1.)))
+        delta = close - shift(close)
+        for n in self.periods['rsi']:
+            gain = _ewm(np.where(np.isnan(delta), np.nan, np.maximum(delta, 0.)), 1. / n)
+            loss = _ewm(np.where(np.isnan(delta), np.nan, np.maximum(-delta, 0.)), 1. / n)
+            self.__state[f'rsi_{n}'] = (gain[-1].copy(), loss[-1].copy())
+            with np.errstate(divide='ignore', invalid='ignore'):
+                self.__store(f'rsi_{n}', 100. - 100. / (1. + gain / loss))
+        tr = true_range(high, low, close)
+        for n in self.periods['atr']:
+            self.__store(f'atr_{n}', _ewm(tr, 1. / n))
+        for n, k in self.periods['bollinger']:
+            for name, band in zip(('mid', 'upper', 'lower'), bollinger(p['close'], n, k)):
+                self.__store(f'bb_{name}_{n}', band)
+
+        self.__length = len(close)
+        self.__state['high'], self.__state['low'] = high[-1].copy(), low[-1].copy()
+        self.__state['close'] = close[-1].copy()
+        rows = min(len(self.__window), len(close))
+        self.__window[-rows:] = p['close'][len(close) - rows:]
+        self.__position = 0
+        return self.results()
+
+    def results(self) -> dict:
+        """
+        views of all computed values, including the bars added by update
+        """
+        return {name: values[:self.__length] for name, values in self.__results.items()}
+
+    def __window_rows(self, n):
+        return (self.__position - 1 - np.arange(n)) % len(self.__window)
+
+    def __window_mean(self, n, values):
+        return values[self.__window_rows(n)].mean(axis=0)
+
+    def update(self, open, high, low, close, volume=None) -> dict:
+        """
+        add one bar for every symbol, arrays are ordered like panel['symbols']
+        returns the new value of every indicator
+        """
+        if not self.__results:
+            raise ValueError('call compute before update')
+        raw_close = np.asarray(close, dtype=float)
+        state = self.__state
+        high = np.where(np.isfinite(high), high, state['high'])
+        low = np.where(np.isfinite(low), low, state['low'])
+        close = np.where(np.isfinite(raw_close), raw_close, state['close'])
+
+        self.__window[self.__position] = raw_close
+        self.__position = (self.__position + 1) % len(self.__window)
+        row = dict()
+        for n in self.periods['sma']:
+            row[f'sma_{n}'] = self.__window_mean(n, self.__window)
+        for n in self.periods['ema']:
+            previous = self.__results[f'ema_{n}'][self.__length - 1]
+            value = previous + 2. / (n + 1.) * (close - previous)
+            row[f'ema_{n}'] = np.where(np.isnan(previous), close, value)
+        delta = close - state['close']
+        for n in self.periods['rsi']:
+            gain, loss = state[f'rsi_{n}']
+            up, down = np.maximum(delta, 0.), np.maximum(-delta, 0.)
+            gain = np.where(np.isnan(gain), up, gain + (up - gain) / n)
+            loss = np.where(np.isnan(loss), down, loss + (down - loss) / n)
+            state[f'rsi_{n}'] = (gain, loss)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                row[f'rsi_{n}'] = 100. - 100. / (1. + gain / loss)
+        tr = np.fmax(high - low, np.fmax(np.abs(high - state['close']), np.abs(low - state['close'])))
+        for n in self.periods['atr']:
+            previous = self.__results[f'atr_{n}'][self.__length - 1]
+            row[f'atr_{n}'] = np.where(np.isnan(previous), tr, previous + (tr - previous) / n)
+        for n, k in self.periods['bollinger']:
+            window = self.__window[self.__window_rows(n)]
+            middle = window.mean(axis=0)
+            # centred on the window mean, like bollinger, so the squares do not lose precision
+            std = np.sqrt(((window - middle) ** 2).mean(axis=0))
+            row[f'bb_mid_{n}'], row[f'bb_upper_{n}'], row[f'bb_lower_{n}'] = middle, middle + k * std, middle - k * std
+
+        for name, values in row.items():
+            self.__append(name, values)
+        self.__length += 1
+        state['high'], state['low'], state['close'] = high, low, close
+        return row
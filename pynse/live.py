@@ -0,0 +1,263 @@
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+import numpy as np
+import pandas as pd
+
+from .pynse import _atomic_write, IndexSymbol
+
+logger = logging.getLogger(__name__)
+
+
+def _to_records(frame):
+    """
+    DataFrame and its index as a structured array without object fields, so it can be memory mapped
+    """
+    frame = frame.reset_index(drop=all(n is None for n in frame.index.names))
+    columns = list()
+    for name in frame.columns:
+        values = frame[name]
+        if values.dtype == object or not isinstance(values.dtype, np.dtype):
+            values = np.asarray(values.where(values.notna(), '').astype(str), dtype=str)
+        columns.append((str(name), np.asarray(values)))
+    records = np.empty(len(frame), dtype=[(name, values.dtype) for name, values in columns])
+    for name, values in columns:
+        records[name] = values
+    return records
+
+
+def _snapshot_files(path, name, seq):
+    return f'{path}{name}_{seq}.npy', f'{path}{name}_{seq}.json'
+
+
+class DataDaemon:
+    """
+    single fetch loop publishing the latest snapshots to every process on the machine
+
+    indices, quotes of symbols and option chains of underlyings are polled by one Nse instance,
+    each snapshot is written once as a .npy structured array with a small json of metadata.
+    a memory mapped {name}.seq file holds the sequence number of the latest version,
+    NseClient reads it and maps the new array without copying, so any number of clients cost one fetch.
+
+    Examples
+    --------
+
+    >>> daemon = DataDaemon(nse, symbols=['SBIN', 'INFY'], option_chains=['NIFTY', 'BANKNIFTY'])
+    >>> daemon.run()
+
+    """
+
+    def __init__(self, nse, symbols: list = (), option_chains: list = (), indices: bool = True,
+                 interval: float = 60, path: str = None, keep: int = 3):
+        """
+        :param symbols: symbols to publish quotes of
+        :param option_chains: underlyings to publish option chains of
+        :param interval: seconds between polls of each snapshot
+        :param path: folder of the snapshots, nse.data_root['live'] if None
+        :param keep: versions of a snapshot kept on disk for clients still reading them
+        """
+        self.nse = nse
+        self.symbols = [s.upper() for s in symbols]
+        self.option_chains = [s.upper() for s in option_chains]
+        self.indices = indices
+        self.interval = interval
+        self.path = nse.data_root['live'] if path is None else path
+        self.keep = keep
+        self.__seq = dict()
+        self.__stop = threading.Event()
+        os.makedirs(self.path, exist_ok=True)
+
+    def __sequence(self, name):
+        if name not in self.__seq:
+            filename = f'{self.path}{name}.seq'
+            if not os.path.exists(filename):
+                _atomic_write(filename, lambda tmp: np.zeros(1, dtype=np.uint64).tofile(tmp))
+            self.__seq[name] = np.memmap(filename, dtype=np.uint64, mode='r+', shape=(1,))
+        return self.__seq[name]
+
+    def publish(self, name: str, frame: pd.DataFrame, **meta) -> int:
+        """
+        write a new version of a snapshot and return its sequence number
+        """
+        sequence = self.__sequence(name)
+        seq = int(sequence[0]) + 1
+        array, info = _snapshot_files(self.path, name, seq)
+        records = _to_records(frame)
+        meta = dict(meta, index=[n for n in frame.index.names if n is not None], published=time.time())
+
+        def write_array(tmp):
+            with open(tmp, 'wb') as f:
+                np.save(f, records, allow_pickle=False)
+
+        def write_info(tmp):
+            with open(tmp, 'w') as f:
+                json.dump(meta, f, default=str)
+
+        _atomic_write(array, write_array)
+        _atomic_write(info, write_info)
+        # clients only look for files once the sequence number points to them
+        sequence[0] = seq
+        sequence.flush()
+        for old in _snapshot_files(self.path, name, seq - self.keep):
+            with contextlib.suppress(OSError):
+                os.remove(old)
+        logger.debug(f'published {name} {seq}')
+        return seq
+
+    def __poll(self, name, fetch):
+        while not self.__stop.is_set():
+            try:
+                fetch()
+            except Exception as e:
+                logger.error(f'{name} failed: {e!r}')
+            self.__stop.wait(self.interval)
+
+    def __publish_indices(self):
+        self.publish('indices', self.nse.get_indices())
+
+    def __publish_option_chains(self):
+        for symbol in self.option_chains:
+            # one request per poll, the timestamp probe and saved pickle of option_chain are not needed here
+            chain = self.nse.option_chain(symbol, live=True)
+            self.publish(f'option_chain_{symbol}', chain['data'], timestamp=chain['timestamp'],
+                         expiry_list=chain['expiry_list'])
+
+    def __publish_quotes(self):
+        latest = dict()
+        for quotes in self.nse.stream_quotes(self.symbols, interval=self.interval):
+            for quote in quotes:
+                latest[quote['symbol']] = quote
+            if quotes:
+                self.publish('quotes', pd.DataFrame(list(latest.values())).set_index('symbol'))
+            if self.__stop.is_set():
+                return
+
+    def run(self, duration: float = None):
+        """
+        poll and publish until stop is called or for duration seconds
+        """
+        loops = list()
+        if self.indices:
+            loops.append(threading.Thread(target=self.__poll, args=('indices', self.__publish_indices), daemon=True))
+        if self.option_chains:
+            loops.append(threading.Thread(target=self.__poll, args=('option_chain', self.__publish_option_chains),
+                                          daemon=True))
+        if self.symbols:
+            loops.append(threading.Thread(target=self.__poll, args=('quotes', self.__publish_quotes), daemon=True))
+        for loop in loops:
+            loop.start()
+        logger.info(f'publishing to {self.path}')
+        self.__stop.wait(duration)
+        self.__stop.set()
+
+    def stop(self):
+        self.__stop.set()
+
+
+class NseClient:
+    """
+    reads snapshots published by DataDaemon with the method names of Nse
+
+    arrays are memory mapped, nothing is requested from nse and a snapshot is only mapped again
+    when its sequence number changes. snapshot returns the mapped array itself without copying,
+    the other methods copy it into a DataFrame once per version and return that same frame until
+    the next version, so it should be copied before being modified
+
+    Examples
+    --------
+
+    >>> client = NseClient(path='C:/Users/goldFisher/pynse/')
+    >>> client.get_indices(IndexSymbol.Nifty50)
+    >>> client.get_quote('SBIN')
+    >>> client.option_chain('NIFTY')
+
+    """
+
+    def __init__(self, path: str = 'data'):
+        """
+        :param path: data folder of the Nse instance running the daemon
+        """
+        self.path = f'{path}/live/'
+        self.__seq = dict()
+        self.__snapshots = dict()
+        self.__frames = dict()
+
+    def sequence(self, name: str) -> int:
+        """
+        sequence number of the latest version of a snapshot, 0 if nothing is published yet
+        """
+        if name not in self.__seq:
+            filename = f'{self.path}{name}.seq'
+            if not os.path.exists(filename):
+                return 0
+            self.__seq[name] = np.memmap(filename, dtype=np.uint64, mode='r', shape=(1,))
+        return int(self.__seq[name][0])
+
+    def snapshot(self, name: str):
+        """
+        latest version of a snapshot as (sequence number, read only structured array, metadata)
+        """
+        while True:
+            seq = self.sequence(name)
+            if seq == 0:
+                raise FileNotFoundError(f'{name} is not published in {self.path}')
+            if name in self.__snapshots and self.__snapshots[name][0] == seq:
+                return self.__snapshots[name]
+            array, info = _snapshot_files(self.path, name, seq)
+            try:
+                records = np.load(array, mmap_mode='r', allow_pickle=False)
+                with open(info) as f:
+                    meta = json.load(f)
+            except FileNotFoundError:
+                # removed by the daemon after newer versions were published
+                continue
+            self.__snapshots[name] = (seq, records, meta)
+            return self.__snapshots[name]
+
+    def wait(self, name: str, seq: int = 0, timeout: float = None, poll: float = 0.05) -> int:
+        """
+        block until a version newer than seq is published, returns the latest sequence number
+        """
+        start = time.time()
+        while self.sequence(name) <= seq:
+            if timeout is not None and time.time() - start > timeout:
+                break
+            time.sleep(poll)
+        return self.sequence(name)
+
+    def __frame(self, name):
+        seq, records, meta = self.snapshot(name)
+        if name not in self.__frames or self.__frames[name][0] != seq:
+            frame = pd.DataFrame(records)
+            self.__frames[name] = (seq, frame.set_index(meta['index']) if meta['index'] else frame)
+        return self.__frames[name][1]
+
+    def get_indices(self, index: IndexSymbol = None) -> pd.DataFrame:
+        """
+        latest index values
+
+        >>> client.get_indices(IndexSymbol.NiftyBank)
+        """
+        data = self.__frame('indices')
+        return data if index is None else data[data.index == index.value]
+
+    def get_quote(self, symbol: str) -> dict:
+        """
+        latest compact quote of a symbol polled by the daemon
+        fields are the ones of stream_quotes
+        """
+        quotes = self.__frame('quotes')
+        quote = quotes.loc[symbol.upper()].to_dict()
+        quote['symbol'] = symbol.upper()
+        return quote
+
+    def option_chain(self, symbol: str = 'NIFTY') -> dict:
+        """
+        latest option chain of an underlying polled by the daemon
+        """
+        name = f'option_chain_{symbol.upper()}'
+        _, _, meta = self.snapshot(name)
+        return {'timestamp': meta['timestamp'], 'data': self.__frame(name), 'expiry_list': meta['expiry_list']}
@@ -10,11 +10,269 @@ import numpy as np
 import io
 import zipfile
 import os
+import re
 import shutil
 import pickle
+import hashlib
+import tempfile
+import contextlib
+import threading
+import asyncio
+import collections
+import concurrent.futures
 
 logger = logging.getLogger(__name__)
 
+# lock files held by the current thread, keys sharing a lock file can be nested
+_held_locks = threading.local()
+
+# read once, os.umask can only be read by setting it
+_umask = os.umask(0)
+os.umask(_umask)
+
+# data folder: (journal file, index file, paths not recorded), registered by Nse for the index of CacheManager
+_journals = dict()
+
+
+def _record(filename, limit=2 ** 24):
+    """
+    append a write or read of a cached file to the journal of its data folder
+    CacheManager replays the journal into its index instead of walking the tree again
+
+    nothing is recorded until a CacheManager saved an index. a journal growing past limit bytes
+    is removed with the index, the next CacheManager call scans the tree again
+    """
+    for root, (journal, index, skip) in _journals.items():
+        if filename.startswith(root):
+            if not filename.startswith(skip) and os.path.exists(index):
+                with contextlib.suppress(OSError):
+                    with open(journal, 'a') as f:
+                        f.write(f'{filename}\t{time.time()}\n')
+                        full = f.tell() > limit
+                    if full:
+                        os.remove(index)
+                        os.remove(journal)
+            return
+
+
+@contextlib.contextmanager
+def _file_lock(lockfile):
+    """
+    exclusive advisory lock on lockfile, shared by threads and processes
+    blocks until the lock is acquired, reentrant within a thread
+    """
+    held = _held_locks.__dict__.setdefault('counts', collections.Counter())
+    if held[lockfile]:
+        held[lockfile] += 1
+        try:
+            yield
+        finally:
+            held[lockfile] -= 1
+        return
+    with open(lockfile, 'a+') as f:
+        if os.name == 'nt':
+            import msvcrt
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    logger.debug(f'waiting for lock {lockfile}')
+            held[lockfile] = 1
+            try:
+                yield
+            finally:
+                held[lockfile] = 0
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            held[lockfile] = 1
+            try:
+                yield
+            finally:
+                held[lockfile] = 0
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _atomic_write(filename, write):
+    """
+    write to a temp file in the same directory and rename it over filename
+    so readers never see a partially written file. the file gets the mode of a plain open() under the umask
+
+    :param write: callable taking the temp file path
+    """
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(filename) or '.', prefix='.tmp_')
+    os.close(fd)
+    try:
+        write(tmp)
+        # mkstemp creates 0600, other users sharing the data folder could not read it
+        os.chmod(tmp, 0o666 & ~_umask)
+        os.replace(tmp, filename)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    _record(filename)
+
+
+def _lock_file(data_root, filename):
+    """
+    lock file for a file in data_root
+    keys share a fixed set of 256 lock files in data_root['locks'] selected by a hash of the key,
+    so the number of lock files does not grow with the cache
+    """
+    key = os.path.relpath(filename, data_root['data_root']).replace(os.sep, '/')
+    return f"{data_root['locks']}{hashlib.md5(key.encode()).hexdigest()[:2]}.lock"
+
+
+def _pack_file(filename):
+    """
+    monthly pack a dated cache file is moved into by CacheManager.compact
+    None for files without a date in their name
+    """
+    match = re.match(r'(?:.*_)?(\d{4}-\d{2})-\d{2}[_.]', os.path.basename(filename))
+    if match is None:
+        return None
+    return os.path.join(os.path.dirname(filename), f'packed_{match.group(1)}.zip')
+
+
+def _write_pack(filename, files):
+    """
+    add cache files to a monthly pack, an uncompressed zip of the files as they are so each one is read alone
+    files already in the pack are not added again. the pack is extended on a copy that replaces it,
+    so readers never see a partially written pack
+    """
+    def write(tmp):
+        if os.path.exists(filename):
+            shutil.copyfile(filename, tmp)
+        with zipfile.ZipFile(tmp, 'a') as zf:
+            packed = set(zf.namelist())
+            for path in files:
+                if os.path.basename(path) not in packed:
+                    zf.write(path, os.path.basename(path))
+
+    _atomic_write(filename, write)
+
+
+def _pack_names(filename):
+    """
+    names of the files in a monthly pack, read from the zip directory only
+    """
+    with zipfile.ZipFile(filename) as zf:
+        return zf.namelist()
+
+
+def _read_packed(filename, name):
+    """
+    object of one file in a monthly pack, other files are not read
+    """
+    with zipfile.ZipFile(filename) as zf:
+        return pd.read_pickle(io.BytesIO(zf.read(name)))
+
+
+def _pipeline(items, fetch, parse, io_workers=4, processes=0, depth=8):
+    """
+    yields parse(fetch(item)) for every item, in the order of items
+
+    fetch runs on a pool of io_workers threads and parse in the same threads, or on a pool of processes,
+    so downloads, parsing and the consumer overlap. at most depth items are in flight, fetching stops
+    while the consumer is behind.
+
+    the process pool is started by the calling thread before any fetching thread exists and parse jobs
+    are submitted from the calling thread, so workers are never forked from a process running downloads
+
+    :param fetch: called in a thread, returning None skips parse and yields None
+    :param parse: module level function, so it can be sent to another process
+    :param processes: number of parse processes, 0 parses in the fetching threads, os.cpu_count() if None
+    """
+    cpu = None
+    if processes != 0:
+        cpu = concurrent.futures.ProcessPoolExecutor(processes)
+        cpu.submit(int).result()
+
+    def stage(item):
+        content = fetch(item)
+        return content if content is None or cpu is not None else parse(content)
+
+    fetching, parsing = collections.deque(), collections.deque()
+
+    def advance():
+        content = fetching.popleft().result()
+        parsing.append(content if cpu is None or content is None else cpu.submit(parse, content))
+
+    def result():
+        value = parsing.popleft()
+        return value.result() if isinstance(value, concurrent.futures.Future) else value
+
+    try:
+        with concurrent.futures.ThreadPoolExecutor(io_workers) as io_pool:
+            try:
+                for item in items:
+                    fetching.append(io_pool.submit(stage, item))
+                    while fetching and fetching[0].done():
+                        advance()
+                    if len(fetching) + len(parsing) >= depth:
+                        if not parsing:
+                            advance()
+                        yield result()
+                while fetching or parsing:
+                    while fetching and fetching[0].done():
+                        advance()
+                    if not parsing:
+                        advance()
+                    yield result()
+            finally:
+                for future in list(fetching) + list(parsing):
+                    if isinstance(future, concurrent.futures.Future):
+                        future.cancel()
+    finally:
+        if cpu is not None:
+            cpu.shutdown()
+
+
+def _parse_bhavcopy(content):
+    csv = content.decode('utf8').replace(" ", "")
+    bhavcopy = pd.read_csv(io.StringIO(csv))
+    bhavcopy["DATE1"] = bhavcopy["DATE1"].apply(lambda x: dt.datetime.strptime(x, '%d-%b-%Y').date())
+    return bhavcopy
+
+
+def _parse_bhavcopy_fno(content):
+    zf = zipfile.ZipFile(io.BytesIO(content))
+    bhavcopy = pd.read_csv(zf.open(zf.namelist()[0]))
+    bhavcopy.set_index('SYMBOL', inplace=True)
+    bhavcopy.dropna(axis=1, inplace=True)
+    bhavcopy.EXPIRY_DT = bhavcopy.EXPIRY_DT.apply(lambda x: dt.datetime.strptime(x, '%d-%b-%Y'))
+    return bhavcopy
+
+
+def _parse_daily_delivery(content):
+    csv = content.decode('utf8').replace(" ", "")
+    daily_delivery = pd.read_csv(io.StringIO(csv), skiprows=3, index_col=False)
+    daily_delivery.columns = list(map((lambda x: x.strip()), daily_delivery.columns))
+    daily_delivery.rename(columns={'NameofSecurity': 'SYMBOL'}, inplace=True)
+    daily_delivery.set_index('SYMBOL', inplace=True)
+    daily_delivery.dropna(axis=1, inplace=True)
+    return daily_delivery
+
+
+def _parse_hist(content):
+    return pd.read_csv(io.StringIO(content.decode('utf8').replace(" ", "")))[::-1]
+
+
+def _parse_hist_index(content):
+    raw_table = BeautifulSoup(content.decode('utf-8'), 'lxml').find_all('table')[0]
+    rows = list()
+    for row_no, row in enumerate(raw_table.find_all('tr')):
+        if row_no > 2:
+            _row = [cell.get_text().replace(" ", "").replace(",", "") for cell in row.find_all('td')]
+            if len(_row) > 4:
+                rows.append(_row)
+    return pd.DataFrame(rows, columns=['Date', 'Open', 'High', 'Low', 'Close', 'SharesTraded', 'Turnover(Cr)'])
+
 
 class IndexSymbol(enum.Enum):
     All = 'ALL'
@@ -88,6 +346,12 @@ class MostActive(enum.Enum):
     OI = 'oi'
 
 
+# one row per symbol and pre open snapshot, see Nse.pre_open_capture
+_PRE_OPEN_DTYPE = np.dtype([('timestamp', 'datetime64[s]'), ('symbol', 'S20'), ('IEP', 'f8'),
+                            ('finalQuantity', 'i8'), ('totalBuyQuantity', 'i8'), ('totalSellQuantity', 'i8'),
+                            ('atoBuyQty', 'i8'), ('atoSellQty', 'i8'), ('pChange', 'f8')])
+
+
 class Nse:
     """
     pynse is a library to extract realtime and historical data from NSE website
@@ -106,32 +370,40 @@ class Nse:
         self.strike_list = list()
         self.max_retries = 5
         self.timeout = 10
+        self.request_interval = 5
+        self.__last_request = 0.
+        self.__request_lock = threading.Lock()
+        self.__pack_names = dict()
         self.__urls, self.__wrls = dict(), list()
         self.data_root = {'data_root': path}
         self.data_root.update({d: f'{self.data_root["data_root"]}/{d}/' for d in
                                ['bhavcopy_eq', 'bhavcopy_fno', 'option_chain', 'symbol_list', 'pre_open', 'hist',
                                 'fii_dii', 'config', 'eq_stock_watch', 'daily_delivery', 'insider_trading',
-                                'corp_info', 'screen_shots']})
+                                'corp_info', 'screen_shots', 'locks', 'intraday', 'screener',
+                                'futures', 'eod', 'live']})
+        index_file = f"{self.data_root['config']}cache_index.pkl"
+        _journals[f'{path}/'] = (f"{self.data_root['config']}cache_journal", index_file,
+                                 (self.data_root['live'], index_file))
         self.__symbol_files = {i.name: f"{self.data_root['symbol_list']}{i.name}.pkl" for i in IndexSymbol}
         self.__zero_files = {i.name: f"{f'{os.path.split(__file__)[0]}/symbol_list/'}{i.name}.pkl" for i in IndexSymbol}
         self.__startup()
         self.__headers = self.__desc(new=False)
         self.symbols = {i.name: self.__read_object(self.__symbol_files[i.name], Format.pkl) for i in IndexSymbol}
 
-    def __get_resp(self, url, retries=0, timeout=0):
+    def __get_resp(self, url, retries=0, timeout=0, headers=None):
         retries = self.max_retries if retries == 0 else retries
         timeout = self.timeout if timeout == 0 else timeout
         self.__headers.update({'Referer': np.random.choice(self.__wrls)})
 
         for nrt in range(retries):
             try:
-                time.sleep(5)
+                self.__throttle()
                 # response = requests.get(url, headers=self.__headers, timeout=timeout)
                 
                 # Fix for new NSE session issue
                 session = requests.Session()
                 response = session.get("http://nseindia.com", headers=self.__headers)
-                response = session.get(url, headers=self.__headers, timeout=timeout)
+                response = session.get(url, headers=dict(self.__headers, **(headers or {})), timeout=timeout)
             except Exception as e:
                 logger.error(e)
                 if nrt + 1 == retries:
@@ -149,32 +421,82 @@ class Nse:
             else:
                 return response
 
+    def __get_static(self, url, filename):
+        """
+        conditional download of a file that rarely changes
+
+        ETag, Last-Modified and a hash of the payload are kept for every url in the config folder.
+        returns (response, validators), response is None if the server answers 304 or sends the same payload
+        while filename is still on disk. validators are saved by __save_validators once filename is saved
+        """
+        vfile = f'{self.data_root["config"]}validators.pkl'
+        known = None
+        if os.path.exists(vfile) and self.__exists(filename):
+            known = self.__read_object(vfile, Format.pkl).get(url)
+        headers = dict()
+        if known is not None:
+            if known['etag']:
+                headers['If-None-Match'] = known['etag']
+            if known['last_modified']:
+                headers['If-Modified-Since'] = known['last_modified']
+        response = self.__get_resp(url, headers=headers)
+        if response.status_code == 304:
+            logger.debug(f'{url} not modified')
+            return None, None
+        validators = {'etag': response.headers.get('ETag'), 'last_modified': response.headers.get('Last-Modified'),
+                      'digest': hashlib.sha1(response.content).hexdigest()}
+        if known is not None and known['digest'] == validators['digest']:
+            logger.debug(f'{url} unchanged')
+            self.__save_validators(url, validators)
+            return None, None
+        return response, validators
+
+    def __save_validators(self, url, validators):
+        vfile = f'{self.data_root["config"]}validators.pkl'
+        with self.__lock(vfile):
+            saved = self.__read_object(vfile, Format.pkl) if os.path.exists(vfile) else dict()
+            saved[url] = validators
+            self.__save_object(saved, vfile, Format.pkl)
+
+    def __throttle(self):
+        """
+        rate limit shared by all threads using this instance
+        waits until request_interval seconds have passed since the previous request
+        """
+        with self.__request_lock:
+            wait = self.__last_request + self.request_interval - time.time()
+            if wait > 0:
+                time.sleep(wait)
+            self.__last_request = time.time()
+
     def __desc(self, new=True):
         from fake_headers import Headers
         hfile = f'{self.data_root["config"]}hf'
         if new or not os.path.exists(hfile):
             h = Headers(headers=True).generate()
-            with open(hfile, 'wb') as f:
-                pickle.dump(h, f)
+            with self.__lock(hfile):
+                self.__save_object(h, hfile, Format.pkl)
         else:
-            with open(hfile, 'rb') as f:
-                h = pickle.load(f)
+            h = self.__read_object(hfile, Format.pkl)
         return h
 
     def __startup(self):
         for _, path in self.data_root.items():
             if path != '':
-                if not os.path.exists(path):
-                    os.mkdir(path)
+                os.makedirs(path, exist_ok=True)
 
         if not os.path.exists(self.__symbol_files['All']):
             logger.debug('First run.\nCreating folders and symbol files')
-            for i in IndexSymbol:
-                if not os.path.exists(self.__symbol_files[i.name]):
-                    try:
-                        shutil.copyfile(self.__zero_files[i.name], self.__symbol_files[i.name])
-                    except Exception as e:
-                        logger.error(e)
+        # checked per file, another process may be halfway through creating them
+        for i in IndexSymbol:
+            if not os.path.exists(self.__symbol_files[i.name]):
+                with self.__lock(self.__symbol_files[i.name]):
+                    if not os.path.exists(self.__symbol_files[i.name]):
+                        try:
+                            _atomic_write(self.__symbol_files[i.name],
+                                          lambda tmp: shutil.copyfile(self.__zero_files[i.name], tmp))
+                        except Exception as e:
+                            logger.error(e)
         self.__urls, self.__wrls = self.__read_object(f'{os.path.split(__file__)[0]}/symbol_list/config', Format.pkl)
 
     @staticmethod
@@ -192,14 +514,141 @@ class Nse:
 
     @staticmethod
     def __save_object(obj, filename, format):
-        if format == Format.pkl:
-            with open(filename, 'wb')as f:
-                pickle.dump(obj, f)
-        elif format == Format.csv:
-            with open(filename, 'w')as f:
-                f.write(obj)
+        def write(tmp):
+            if format == Format.pkl:
+                with open(tmp, 'wb')as f:
+                    pickle.dump(obj, f)
+            elif format == Format.csv:
+                with open(tmp, 'w')as f:
+                    f.write(obj)
+
+        _atomic_write(filename, write)
         logger.debug(f'saved {filename}')
 
+    def __lock(self, filename):
+        """
+        per-key lock for a file in data_root
+        """
+        return _file_lock(_lock_file(self.data_root, filename))
+
+    def __packed_names(self, pack):
+        """
+        file names in a monthly pack, kept in memory until the pack changes
+        """
+        if pack is None:
+            return set()
+        try:
+            mtime = os.path.getmtime(pack)
+            cached = self.__pack_names.get(pack)
+            if cached is None or cached[0] != mtime:
+                cached = (mtime, set(_pack_names(pack)))
+                self.__pack_names[pack] = cached
+        except FileNotFoundError:
+            return set()
+        return cached[1]
+
+    def __exists(self, filename):
+        """
+        True if filename is on disk either as a file or in its monthly pack
+        """
+        return os.path.exists(filename) or os.path.basename(filename) in self.__packed_names(_pack_file(filename))
+
+    def __read_cached(self, filename):
+        """
+        read a pickled cache file or its copy in the monthly pack
+        access time is updated for the LRU eviction of CacheManager
+        """
+        try:
+            obj = pd.read_pickle(filename)
+        except FileNotFoundError:
+            if not self.__exists(filename):
+                raise
+            pack = _pack_file(filename)
+            obj = _read_packed(pack, os.path.basename(filename))
+            with contextlib.suppress(OSError):
+                os.utime(pack, (time.time(), os.path.getmtime(pack)))
+            _record(pack)
+        else:
+            with contextlib.suppress(OSError):
+                os.utime(filename, (time.time(), os.path.getmtime(filename)))
+            _record(filename)
+        logger.debug(f'read {filename} from disk')
+        return obj
+
+    def __cached(self, filename, download):
+        """
+        read pickled object from disk
+        or
+        download and save it
+
+        only one process downloads a missing key, others wait for the lock and read the saved file
+        """
+        if not self.__exists(filename):
+            with self.__lock(filename):
+                if not self.__exists(filename):
+                    obj = download()
+                    _atomic_write(filename, lambda tmp: pd.to_pickle(obj, tmp))
+                    logger.debug(f'saved {filename}')
+                    return obj
+        return self.__read_cached(filename)
+
+    @staticmethod
+    def __merge_intervals(intervals):
+        merged = list()
+        for start, end in sorted(intervals):
+            if merged and start <= merged[-1][1] + dt.timedelta(days=1):
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        return merged
+
+    @staticmethod
+    def __uncovered(intervals, from_date, to_date):
+        """
+        sub ranges of from_date to to_date not covered by merged intervals
+        """
+        gaps = list()
+        start = from_date
+        for lo, hi in intervals:
+            if hi < start:
+                continue
+            if lo > to_date:
+                break
+            if lo > start:
+                gaps.append((start, lo - dt.timedelta(days=1)))
+            start = max(start, hi + dt.timedelta(days=1))
+        if start <= to_date:
+            gaps.append((start, to_date))
+        return gaps
+
+    def __range_cached(self, filename, from_date, to_date, download, date_column):
+        """
+        read records between from_date and to_date from a range store
+        or
+        download only the sub ranges not covered yet and merge them into the store
+
+        the store keeps the covered date intervals and deduplicated records of every download.
+        coverage stops at yesterday, so days still in progress are downloaded again on the next call
+        """
+        empty = {'intervals': list(), 'data': pd.DataFrame()}
+        store = self.__read_cached(filename) if self.__exists(filename) else empty
+        if self.__uncovered(store['intervals'], from_date, to_date):
+            with self.__lock(filename):
+                store = self.__read_cached(filename) if self.__exists(filename) else empty
+                gaps = self.__uncovered(store['intervals'], from_date, to_date)
+                data = pd.concat([store['data']] + [download(lo, hi) for lo, hi in gaps], ignore_index=True, sort=False)
+                data = data[~data.astype(str).duplicated(keep='last')].reset_index(drop=True)
+                yesterday = dt.date.today() - dt.timedelta(days=1)
+                covered = [(lo, min(hi, yesterday)) for lo, hi in gaps if lo <= yesterday]
+                store = {'intervals': self.__merge_intervals(store['intervals'] + covered), 'data': data}
+                _atomic_write(filename, lambda tmp: pd.to_pickle(store, tmp))
+                logger.debug(f'downloaded {gaps} into {filename}')
+        data = store['data']
+        if data.empty:
+            return data
+        dates = pd.to_datetime(data[date_column], dayfirst=True, errors='coerce').dt.normalize()
+        return data[(dates >= pd.Timestamp(from_date)) & (dates <= pd.Timestamp(to_date))].reset_index(drop=True)
+
     @staticmethod
     def __validate_symbol(symbol, _list):
         symbol = symbol if isinstance(symbol, IndexSymbol) else symbol.upper()
@@ -288,6 +737,8 @@ class Nse:
                 quote.update(series=data['metadata']['series'])
                 quote.update(symbol=data['metadata']['symbol'])
                 quote.update(data['securityWiseDP'])
+                quote['totalTradedVolume'] = data.get('marketDeptOrderBook', {}).get('tradeInfo', {}).get(
+                    'totalTradedVolume')
                 quote['low'] = quote['intraDayHighLow']['min']
                 quote['high'] = quote['intraDayHighLow']['max']
 
@@ -338,6 +789,113 @@ class Nse:
 
             return quote
 
+    @staticmethod
+    def __poll_plan(symbols, interval, count):
+        """
+        schedule for polling symbols, requests are spread evenly across the interval
+        yields (due time, symbol), symbol is None at the end of every cycle
+        """
+        slot = interval / len(symbols)
+        start = time.time()
+        cycle = 0
+        while count is None or cycle < count:
+            for i, symbol in enumerate(symbols):
+                yield start + i * slot, symbol
+            yield start + interval, None
+            # a late cycle is not made up for, the next one starts now
+            start = max(start + interval, time.time())
+            cycle += 1
+
+    def __poll_quote(self, symbol, last):
+        """
+        compact quote record for symbol
+        None if the quote failed or lastPrice, volume and timestamp are same as in last
+        """
+        try:
+            quote = self.get_quote(symbol)
+        except Exception as e:
+            logger.error(f'quote for {symbol} failed: {e}')
+            return None
+        record = {'symbol': quote['symbol'],
+                  'timestamp': quote['timestamp'],
+                  'lastPrice': quote.get('lastPrice'),
+                  'change': quote.get('change'),
+                  'pChange': quote.get('pChange'),
+                  'volume': quote.get('totalTradedVolume') or quote.get('quantityTraded')}
+        key = (record['lastPrice'], record['volume'], record['timestamp'])
+        if last.get(symbol) == key:
+            return None
+        last[symbol] = key
+        return record
+
+    def __stream_setup(self, symbols, interval):
+        symbols = [s.upper() for s in symbols]
+        if not symbols:
+            raise ValueError('no symbols to stream')
+        # every equity quote takes two requests
+        min_interval = 2 * self.request_interval * len(symbols)
+        if interval < min_interval:
+            logger.warning(f'{len(symbols)} symbols need at least {min_interval}s per cycle under the rate limit')
+        return symbols
+
+    def stream_quotes(self, symbols: list, interval: float = 60, count: int = None):
+        """
+        poll realtime quotes for symbols every interval seconds
+
+        requests are spread evenly across the interval under the rate limit
+        yields a list of compact quotes for the symbols whose lastPrice, volume or timestamp
+        changed in that cycle, cycles without any change are skipped
+
+        :param count: number of cycles, runs forever if None
+
+        Examples
+        --------
+
+        >>> for quotes in nse.stream_quotes(['SBIN', 'INFY'], interval=60):
+        ...     print(quotes)
+
+        """
+        symbols = self.__stream_setup(symbols, interval)
+        last, batch = dict(), list()
+        for due, symbol in self.__poll_plan(symbols, interval, count):
+            if symbol is None and batch:
+                yield batch
+                batch = list()
+            wait = due - time.time()
+            if wait > 0:
+                time.sleep(wait)
+            if symbol is not None:
+                record = self.__poll_quote(symbol, last)
+                if record is not None:
+                    batch.append(record)
+
+    async def astream_quotes(self, symbols: list, interval: float = 60, count: int = None):
+        """
+        async version of stream_quotes
+        quotes are downloaded in the default executor so the event loop is not blocked
+
+        Examples
+        --------
+
+        >>> async for quotes in nse.astream_quotes(['SBIN', 'INFY'], interval=60):
+        ...     print(quotes)
+
+        """
+        symbols = self.__stream_setup(symbols, interval)
+        loop = asyncio.get_event_loop()
+        last, batch = dict(), list()
+        for due, symbol in self.__poll_plan(symbols, interval, count):
+            if symbol is None and batch:
+                yield batch
+                batch = list()
+            wait = due - time.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            if symbol is not None:
+                record = await loop.run_in_executor(None, self.__poll_quote, symbol, last)
+                if record is not None:
+                    batch.append(record)
+
     def bhavcopy(self, req_date: dt.date = None,
                  series: str = 'eq') -> pd.DataFrame:
         """
@@ -355,18 +913,12 @@ class Nse:
 
         series = series.upper()
         req_date = self.__trading_days()[-1].date() if req_date is None else req_date
-        filename = f'{self.data_root["bhavcopy_eq"]}bhav_{req_date}.pkl'
-        bhavcopy = None
-        if os.path.exists(filename):
-            bhavcopy = pd.read_pickle(filename)
-            logger.debug(f'read {filename} from disk')
-        else:
-            config = self.__urls
-            url = config['path']['bhavcopy'].format(date=req_date.strftime("%d%m%Y"))
-            csv = self.__get_resp(url).content.decode('utf8').replace(" ", "")
-            bhavcopy = pd.read_csv(io.StringIO(csv))
-            bhavcopy["DATE1"] = bhavcopy["DATE1"].apply(lambda x: dt.datetime.strptime(x, '%d-%b-%Y').date())
-            bhavcopy.to_pickle(filename)
+        filename, url, parse = self.__archive('bhavcopy_eq', req_date)
+
+        def download():
+            return parse(self.__get_resp(url).content)
+
+        bhavcopy = self.__cached(filename, download)
 
         if bhavcopy is not None:
             if series != 'ALL':
@@ -390,28 +942,73 @@ class Nse:
 
         """
         req_date = self.__trading_days()[-1].date() if req_date is None else req_date
-        filename = f'{self.data_root["bhavcopy_fno"]}bhav_{req_date}.pkl'
-        bhavcopy = None
-        if os.path.exists(filename):
-            bhavcopy = pd.read_pickle(filename)
-            logger.debug(f'read {filename} from disk')
-        else:
-            config = self.__urls
+        filename, url, parse = self.__archive('bhavcopy_fno', req_date)
+
+        def download():
+            logger.debug("downloading bhavcopy for {}".format(req_date))
+            return parse(self.__get_resp(url).content)
+
+        return self.__cached(filename, download)
+
+    def __archive(self, kind, req_date):
+        """
+        filename, url and parser of a daily archive file
+        """
+        config = self.__urls
+        if kind == 'bhavcopy_eq':
+            return (f'{self.data_root["bhavcopy_eq"]}bhav_{req_date}.pkl',
+                    config['path']['bhavcopy'].format(date=req_date.strftime("%d%m%Y")), _parse_bhavcopy)
+        elif kind == 'bhavcopy_fno':
             url = config['path']['bhavcopy_derivatives'].format(date=req_date.strftime("%d%b%Y").upper(),
                                                                 month=req_date.strftime("%b").upper(),
                                                                 year=req_date.strftime("%Y"))
-            logger.debug("downloading bhavcopy for {}".format(req_date))
-            stream = self.__get_resp(
-                url).content
-            filebytes = io.BytesIO(stream)
-            zf = zipfile.ZipFile(filebytes)
-            bhavcopy = pd.read_csv(zf.open(zf.namelist()[0]))
-            bhavcopy.set_index('SYMBOL', inplace=True)
-            bhavcopy.dropna(axis=1, inplace=True)
-            bhavcopy.EXPIRY_DT = bhavcopy.EXPIRY_DT.apply(lambda x: dt.datetime.strptime(x, '%d-%b-%Y'))
-            bhavcopy.to_pickle(filename)
+            return f'{self.data_root["bhavcopy_fno"]}bhav_{req_date}.pkl', url, _parse_bhavcopy_fno
+        elif kind == 'daily_delivery':
+            return (f'{self.data_root["daily_delivery"]}daily_delivery_{req_date}.pkl',
+                    config['path']['daily_delivery'].format(date=req_date.strftime("%d%m%Y").upper()),
+                    _parse_daily_delivery)
+        raise ValueError(f'{kind} is not a daily archive')
+
+    def bulk(self, kind: str, dates: list, io_workers: int = 4, processes: int = 0):
+        """
+        download or read many daily archive files, downloads and parsing run in parallel
 
-        return bhavcopy
+        files are downloaded and parsed on a thread pool under the shared rate limit, or parsed on a process pool
+        if processes is given, yields (date, data) in the order of dates. files already on disk are read without
+        a request
+
+        :param kind: 'bhavcopy_eq', 'bhavcopy_fno' or 'daily_delivery'
+        :param processes: number of parse processes, 0 parses in the download threads, os.cpu_count() if None.
+            on Windows and macOS a script using processes needs an if __name__ == '__main__' guard
+
+        Examples
+        --------
+
+        >>> for date, bhavcopy in nse.bulk('bhavcopy_fno', nse.trading_calendar(dt.date(2020, 1, 1))):
+        ...     print(date, len(bhavcopy))
+
+        """
+        archives = [(date,) + self.__archive(kind, date) for date in dates]
+        if not archives:
+            return
+
+        def fetch(archive):
+            date, filename, url, _ = archive
+            if self.__exists(filename):
+                return None
+            logger.debug(f'downloading {kind} for {date}')
+            return self.__get_resp(url).content
+
+        parsed = _pipeline(archives, fetch, archives[0][3], io_workers=io_workers, processes=processes)
+        for (date, filename, _, _), data in zip(archives, parsed):
+            if data is None:
+                data = self.__read_cached(filename)
+            else:
+                with self.__lock(filename):
+                    if not self.__exists(filename):
+                        _atomic_write(filename, lambda tmp: pd.to_pickle(data, tmp))
+                        logger.debug(f'saved {filename}')
+            yield date, data
 
     def pre_open(self) -> pd.DataFrame:
         """
@@ -426,26 +1023,119 @@ class Nse:
         """
 
         filename = f"{self.data_root['pre_open']}{dt.date.today()}.pkl"
-        if os.path.exists(filename):
-            pre_open_data = pd.read_pickle(filename)
-            logging.debug('pre_open data read from file')
+        with self.__lock(filename):
+            if os.path.exists(filename):
+                pre_open_data = pd.read_pickle(filename)
+                logging.debug('pre_open data read from file')
 
-        else:
-            logger.debug("downloading preopen data")
-            config = self.__urls
-            url = config['host'] + config['path']['preOpen']
-            data = self.__get_resp(url).json()
-            timestamp = dt.datetime.strptime(data['timestamp'], "%d-%b-%Y %H:%M:%S").date()
-            pre_open_data = pd.json_normalize(data['data'])
-            pre_open_data = pre_open_data.set_index('metadata.symbol')
-            pre_open_data["detail.preOpenMarket.lastUpdateTime"] = pre_open_data[
-                "detail.preOpenMarket.lastUpdateTime"].apply(
-                lambda x: dt.datetime.strptime(x, '%d-%b-%Y %H:%M:%S'))
-            filename = f"{self.data_root['pre_open']}{timestamp}.pkl"
-            pre_open_data.to_pickle(filename)
+            else:
+                logger.debug("downloading preopen data")
+                config = self.__urls
+                url = config['host'] + config['path']['preOpen']
+                data = self.__get_resp(url).json()
+                timestamp = dt.datetime.strptime(data['timestamp'], "%d-%b-%Y %H:%M:%S").date()
+                pre_open_data = pd.json_normalize(data['data'])
+                pre_open_data = pre_open_data.set_index('metadata.symbol')
+                pre_open_data["detail.preOpenMarket.lastUpdateTime"] = pre_open_data[
+                    "detail.preOpenMarket.lastUpdateTime"].apply(
+                    lambda x: dt.datetime.strptime(x, '%d-%b-%Y %H:%M:%S'))
+                filename = f"{self.data_root['pre_open']}{timestamp}.pkl"
+                _atomic_write(filename, lambda tmp: pre_open_data.to_pickle(tmp))
 
         return pre_open_data
 
+    @staticmethod
+    def __pre_open_rows(data, last):
+        """
+        typed rows for symbols updated since the previous snapshot
+        last maps symbol to its previous lastUpdateTime and is updated in place
+        """
+
+        def num(x):
+            try:
+                return float(str(x).replace(',', ''))
+            except ValueError:
+                return 0.
+
+        rows = []
+        for item in data['data']:
+            symbol = item['metadata']['symbol']
+            market = item['detail']['preOpenMarket']
+            updated = market.get('lastUpdateTime', data['timestamp'])
+            if last.get(symbol) == updated:
+                continue
+            last[symbol] = updated
+            rows.append((np.datetime64(dt.datetime.strptime(updated, '%d-%b-%Y %H:%M:%S'), 's'),
+                         symbol.encode(),
+                         num(market.get('IEP')),
+                         num(market.get('finalQuantity')),
+                         num(market.get('totalBuyQuantity')),
+                         num(market.get('totalSellQuantity')),
+                         num(market.get('atoBuyQty')),
+                         num(market.get('atoSellQty')),
+                         num(item['metadata'].get('pChange'))))
+        return np.array(rows, dtype=_PRE_OPEN_DTYPE)
+
+    def pre_open_capture(self, interval: float = 15, until: dt.time = dt.time(9, 8)) -> str:
+        """
+        snapshot pre open data every interval seconds until `until`
+
+        every snapshot appends one typed row per updated symbol (IEP, quantities, buy and sell totals)
+        to {date}_session.bin in the pre_open folder, read it back with pre_open_session
+        returns the filename
+
+        Examples
+        --------
+
+        >>> nse.pre_open_capture(interval=10)
+
+        """
+        config = self.__urls
+        url = config['host'] + config['path']['preOpen']
+        last = dict()
+        filename = None
+        while True:
+            start = time.time()
+            data = self.__get_resp(url).json()
+            date = dt.datetime.strptime(data['timestamp'], "%d-%b-%Y %H:%M:%S").date()
+            filename = f"{self.data_root['pre_open']}{date}_session.bin"
+            rows = self.__pre_open_rows(data, last)
+            if len(rows):
+                with self.__lock(filename):
+                    with open(filename, 'ab') as f:
+                        f.write(rows.tobytes())
+                logger.debug(f'{len(rows)} pre open rows added to {filename}')
+            if dt.datetime.now().time() >= until:
+                break
+            time.sleep(max(0., interval - (time.time() - start)))
+        return filename
+
+    def pre_open_session(self, req_date: dt.date = None) -> pd.DataFrame:
+        """
+        read pre open snapshots captured by pre_open_capture
+        as a DataFrame indexed by (timestamp, symbol)
+
+        Examples
+        --------
+
+        >>> nse.pre_open_session()
+
+        >>> nse.pre_open_session(dt.date(2020, 7, 20))['IEP'].unstack()
+
+        """
+        req_date = dt.date.today() if req_date is None else req_date
+        filename = f"{self.data_root['pre_open']}{req_date}_session.bin"
+        if not os.path.exists(filename):
+            raise FileNotFoundError(f'{filename} not found')
+        # a row cut short by an interrupted capture is dropped
+        count = os.path.getsize(filename) // _PRE_OPEN_DTYPE.itemsize
+        rows = np.fromfile(filename, dtype=_PRE_OPEN_DTYPE, count=count)
+        session = pd.DataFrame({name: rows[name] for name in _PRE_OPEN_DTYPE.names if name != 'symbol'})
+        session['symbol'] = pd.Series(rows['symbol']).str.decode('ascii')
+        session = session.set_index(['timestamp', 'symbol'])
+        # restarted captures can write the same update twice
+        return session[~session.index.duplicated(keep='last')].sort_index()
+
     def __option_chain_download(self, symbol):
         symbol = self.__validate_symbol(symbol, self.symbols[IndexSymbol.FnO.name] + ['NIFTY', 'BANKNIFTY', 'NIFTYIT'])
         logger.debug('download option chain')
@@ -455,13 +1145,21 @@ class Nse:
         data = self.__get_resp(url).json()
         return data
 
-    def option_chain(self, symbol: str = 'NIFTY', req_date: dt.date = None) -> dict:
+    @staticmethod
+    def __parse_option_chain(data):
+        expiry_list = data['records']['expiryDates']
+        option_chain = pd.json_normalize(data['records']['data'])
+        timestamp = data['records']['timestamp']
+        return {'timestamp': timestamp, 'data': option_chain, 'expiry_list': expiry_list}
+
+    def option_chain(self, symbol: str = 'NIFTY', req_date: dt.date = None, live: bool = False) -> dict:
         """
         downloads the option chain
         or
         reads if already downloaded
 
         if no req_date is specified latest available option chain from nse website
+        live downloads the current option chain with one request, nothing is read from or saved to disk
 
         :returns dictonaly containing
             timestamp as str
@@ -475,15 +1173,18 @@ class Nse:
 
         >>> nse.option_chain('INFY',expiry=dt.date(2020,6,30))
 
+        >>> nse.option_chain('NIFTY', live=True)
+
         """
+        if live:
+            return self.__parse_option_chain(self.__option_chain_download(symbol))
         dir = f"{self.data_root['option_chain']}{symbol}/"
-        if not os.path.exists(dir):
-            os.mkdir(dir)
+        os.makedirs(dir, exist_ok=True)
 
         download_req = True
         filename = f"{dir}{dt.date.today()}_eod.pkl"
 
-        if os.path.exists(filename):
+        if self.__exists(filename):
             download_req = False
         elif req_date is None:
 
@@ -495,11 +1196,11 @@ class Nse:
                 download_req = True
             elif timestamp.date() == dt.date.today():
                 filename = f"{dir}{dt.date.today()}_eod.pkl"
-                download_req = False if os.path.exists(filename) else True
+                download_req = False if self.__exists(filename) else True
             else:
                 prev_trading_day = self.__trading_days()[-1].date()
                 filename = f"{dir}{prev_trading_day}_eod.pkl"
-                download_req = False if os.path.exists(filename) else True
+                download_req = False if self.__exists(filename) else True
         else:
             if req_date == dt.date.today():
                 q = self.get_quote()
@@ -510,23 +1211,21 @@ class Nse:
                     download_req = True
                 else:
                     filename = filename = f"{dir}{req_date}_eod.pkl"
-                    download_req = False if os.path.exists(filename) else True
+                    download_req = False if self.__exists(filename) else True
             else:
                 prev_trading_day = self.__trading_days()[-1]
                 if req_date >= prev_trading_day:
                     filename = filename = f"{dir}{prev_trading_day}_eod.pkl"
-                    download_req = False if os.path.exists(filename) else True
+                    download_req = False if self.__exists(filename) else True
                 else:
                     filename = filename = f"{dir}{req_date}_eod.pkl"
                     download_req = False
         if download_req:
-            data = self.__option_chain_download(symbol)
-            self.__save_object(data, filename, Format.pkl)
-        data = self.__read_object(filename, Format.pkl)
-        expiry_list = data['records']['expiryDates']
-        option_chain = pd.json_normalize(data['records']['data'])
-        timestamp = data['records']['timestamp']
-        return {'timestamp': timestamp, 'data': option_chain, 'expiry_list': expiry_list}
+            with self.__lock(filename):
+                if not self.__exists(filename):
+                    data = self.__option_chain_download(symbol)
+                    self.__save_object(data, filename, Format.pkl)
+        return self.__parse_option_chain(self.__read_cached(filename))
 
     def fii_dii(self) -> pd.DataFrame:
         """
@@ -541,34 +1240,36 @@ class Nse:
 
         filename = f'{self.data_root["fii_dii"]}fii_dii.csv'
 
-        if not os.path.exists(filename):
-            mode = 'w'
-            timestamp = dt.date.today() - dt.timedelta(days=2)
-        else:
-            mode = 'a'
-            csv_file = pd.read_csv(filename, header=[0, 1], index_col=[0])
-            timestamp = dt.datetime.strptime(csv_file.tail(1).index[0], '%d-%b-%Y').date()
-        if timestamp == dt.date.today() or timestamp == dt.date.today() - dt.timedelta(
-                days=1) and dt.datetime.now().time() < dt.time(15, 30):
-            logger.debug('read fii/dii data from disk')
-            return csv_file.tail(1)
-        else:
-            config = self.__urls
-            url = config['host'] + config['path']['fii_dii']
-            resp = self.__get_resp(url).json()
-            resp[0].pop('date')
-            date = resp[1].pop('date')
-            fii = [d for d in resp if d['category'] == 'FII/FPI *'][0]
-            dii = [d for d in resp if d['category'] == 'DII **'][0]
-            fii_dii = pd.concat(
-                [pd.json_normalize(fii),
-                 pd.json_normalize(dii)],
-                axis=1,
-                keys=[fii['category'], dii['category']])
-            fii_dii.index = [date]
-            if dt.datetime.strptime(date, '%d-%b-%Y').date() != timestamp:
-                fii_dii.to_csv(filename, mode=mode, header=True if mode == 'w' else False)
-            return fii_dii.tail(1)
+        with self.__lock(filename):
+            if not os.path.exists(filename):
+                mode = 'w'
+                timestamp = dt.date.today() - dt.timedelta(days=2)
+            else:
+                mode = 'a'
+                csv_file = pd.read_csv(filename, header=[0, 1], index_col=[0])
+                timestamp = dt.datetime.strptime(csv_file.tail(1).index[0], '%d-%b-%Y').date()
+            if timestamp == dt.date.today() or timestamp == dt.date.today() - dt.timedelta(
+                    days=1) and dt.datetime.now().time() < dt.time(15, 30):
+                logger.debug('read fii/dii data from disk')
+                return csv_file.tail(1)
+            else:
+                config = self.__urls
+                url = config['host'] + config['path']['fii_dii']
+                resp = self.__get_resp(url).json()
+                resp[0].pop('date')
+                date = resp[1].pop('date')
+                fii = [d for d in resp if d['category'] == 'FII/FPI *'][0]
+                dii = [d for d in resp if d['category'] == 'DII **'][0]
+                fii_dii = pd.concat(
+                    [pd.json_normalize(fii),
+                     pd.json_normalize(dii)],
+                    axis=1,
+                    keys=[fii['category'], dii['category']])
+                fii_dii.index = [date]
+                if dt.datetime.strptime(date, '%d-%b-%Y').date() != timestamp:
+                    fii_dii.to_csv(filename, mode=mode, header=True if mode == 'w' else False)
+                    _record(filename)
+                return fii_dii.tail(1)
 
     def __get_hist(self, symbol='SBIN', from_date=None, to_date=None):
         config = self.__urls
@@ -577,7 +1278,7 @@ class Nse:
             from_date = dt.date.today() - dt.timedelta(days=30)
         if to_date == None:
             to_date = dt.date.today()
-        hist = pd.DataFrame()
+        urls = []
         while True:
             if (to_date - from_date).days > max_date_range:
                 marker = from_date + dt.timedelta(max_date_range)
@@ -585,19 +1286,15 @@ class Nse:
                                                                      from_date=from_date.strftime('%d-%m-%Y'),
                                                                      to_date=marker.strftime('%d-%m-%Y'))
                 from_date = from_date + dt.timedelta(days=(max_date_range + 1))
-                csv = self.__get_resp(url).content.decode('utf8').replace(" ", "")
-                is_complete = False
+                urls.append(url)
             else:
                 url = config['host'] + config['path']['hist'].format(symbol=symbol,
                                                                      from_date=from_date.strftime('%d-%m-%Y'),
                                                                      to_date=to_date.strftime('%d-%m-%Y'))
-                from_date = from_date + dt.timedelta(max_date_range + 1)
-                csv = self.__get_resp(url).content.decode('utf8').replace(" ", "")
-                is_complete = True
-            hist = pd.concat([hist, pd.read_csv(io.StringIO(csv))[::-1]])
-            if is_complete:
+                urls.append(url)
                 break
-            time.sleep(1)
+        # chunks are parsed in the fetching threads while the next ones download
+        hist = pd.concat(list(_pipeline(urls, lambda url: self.__get_resp(url).content, _parse_hist)))
         hist['Date'] = pd.to_datetime(hist['Date'])
         hist.set_index('Date', inplace=True)
         hist.drop(['series', 'PREV.CLOSE', 'ltp', 'vwap', '52WH', '52WL', 'VALUE', 'Nooftrades'], axis=1, inplace=True)
@@ -632,23 +1329,9 @@ class Nse:
                 url = f"{base_url}{symbol}&fromDate={from_date.strftime('%d-%m-%Y')}&toDate={to_date.strftime('%d-%m-%Y')}"
                 urls.append(url)
                 break
-        hist = pd.DataFrame(columns=[
-            'Date', 'Open', 'High', 'Low', 'Close', 'SharesTraded',
-            'Turnover(Cr)'
-        ])
-        for url in urls:
-            page = self.__get_resp(url).content.decode('utf-8')
-            raw_table = BeautifulSoup(page, 'lxml').find_all('table')[0]
-            rows = raw_table.find_all('tr')
-            for row_no, row in enumerate(rows):
-                if row_no > 2:
-                    _row = [
-                        cell.get_text().replace(" ", "").replace(",", "")
-                        for cell in row.find_all('td')
-                    ]
-                    if len(_row) > 4:
-                        hist.loc[len(hist)] = _row
-            time.sleep(1)
+        # chunks are parsed in the fetching threads while the next ones download
+        hist = pd.concat(list(_pipeline(urls, lambda url: self.__get_resp(url).content, _parse_hist_index)),
+                         ignore_index=True)
         hist.Date = hist.Date.apply(lambda d: dt.datetime.strptime(d, '%d-%b-%Y'))
         hist.set_index("Date", inplace=True)
         for col in hist.columns:
@@ -724,21 +1407,35 @@ class Nse:
         if not isinstance(index, IndexSymbol):
             raise TypeError('index is not of type "Index"')
         config = self.__urls
+        filename = self.data_root['symbol_list'] + index.name + '.pkl'
         if index == IndexSymbol.All:
             data = list(self.bhavcopy().reset_index().SYMBOL)
-        elif index == IndexSymbol.FnO:
-            url = config['host'] + config['path']['fnoSymbols']
-            data = self.__get_resp(url).json()
-            data.extend(['NIFTY', 'BANKNIFTY'])
         else:
-            url = config['host'] + config['path']['symbol_list'].format(
-                index=self.__validate_symbol(index, IndexSymbol))
-            data = self.__get_resp(url).json()['data']
-            data = [i['meta']['symbol'] for i in data if i['identifier'] != index.value]
+            if index == IndexSymbol.FnO:
+                url = config['host'] + config['path']['fnoSymbols']
+            else:
+                url = config['host'] + config['path']['symbol_list'].format(
+                    index=self.__validate_symbol(index, IndexSymbol))
+            response, validators = self.__get_static(url, filename)
+            if response is None:
+                logger.info(f'symbol list unchanged for {index}')
+                return self.__read_object(filename, Format.pkl)
+            if index == IndexSymbol.FnO:
+                data = response.json()
+                data.extend(['NIFTY', 'BANKNIFTY'])
+            else:
+                data = response.json()['data']
+                data = [i['meta']['symbol'] for i in data if i['identifier'] != index.value]
         data.sort()
-        with open(self.data_root['symbol_list'] + index.name + '.pkl', 'wb')as f:
-            pickle.dump(data, f)
+        if os.path.exists(filename) and self.__read_object(filename, Format.pkl) == data:
+            logger.info(f'symbol list unchanged for {index}')
+        else:
+            with self.__lock(filename):
+                self.__save_object(data, filename, Format.pkl)
             logger.info(f'symbol list saved for {index}')
+        # only once the list is parsed and saved, a failure requests the whole list again
+        if index != IndexSymbol.All:
+            self.__save_validators(url, validators)
         return data
 
     def update_symbol_list(self):
@@ -748,6 +1445,7 @@ class Nse:
         required when constituent of an index is changed
         or
         list of securities in fno are updates
+        lists are requested conditionally, unchanged lists are not parsed or saved again
         :return: None
 
         Examples:
@@ -756,7 +1454,7 @@ class Nse:
         ```
         """
         for i in [a for a in IndexSymbol]:
-            self.__symbol_list(i)
+            self.symbols[i.name] = self.__symbol_list(i)
             time.sleep(1)
 
     def __trading_days(self):
@@ -777,11 +1475,52 @@ class Nse:
                                           to_date=dt.date.today()).reset_index()[['Date']]
 
             trading_days = pd.concat([trading_days, _trading_days]).drop_duplicates()
-            trading_days.to_csv(filename, mode='w', index=False, header=False)
+            with self.__lock(filename):
+                _atomic_write(filename, lambda tmp: trading_days.to_csv(tmp, mode='w', index=False, header=False))
         trading_days = pd.read_csv(filename, header=None, index_col=0)
         trading_days.index = trading_days.index.map(lambda x: dt.datetime.strptime(x, "%Y-%m-%d"))
         return trading_days.index
 
+    def trading_calendar(self, from_date: dt.date, to_date: dt.date = None) -> list:
+        """
+        trading days between from_date and to_date, taken from SBIN history
+
+        Examples
+        --------
+
+        >>> nse.trading_calendar(dt.date(2020, 1, 1), dt.date(2020, 6, 30))
+
+        """
+        to_date = dt.date.today() if to_date is None else to_date
+        hist = self.get_hist('SBIN', from_date=from_date, to_date=to_date)
+        return sorted(d.date() for d in hist.index)
+
+    def cached_dates(self, kind: str = 'bhavcopy_eq', from_date: dt.date = None, to_date: dt.date = None) -> list:
+        """
+        dates already downloaded for daily data
+        kind is one of bhavcopy_eq, bhavcopy_fno, daily_delivery, eq_stock_watch
+
+        Examples
+        --------
+
+        >>> nse.cached_dates('bhavcopy_fno', from_date=dt.date(2020, 1, 1))
+
+        """
+        names = list()
+        for name in os.listdir(self.data_root[kind]):
+            month = re.match(r'packed_(\d{4})-(\d{2})\.zip$', name)
+            if month is None:
+                names.append(name)
+            elif (from_date is None or (int(month.group(1)), int(month.group(2))) >= (from_date.year, from_date.month)) \
+                    and (to_date is None or (int(month.group(1)), int(month.group(2))) <= (to_date.year, to_date.month)):
+                names.extend(self.__packed_names(f'{self.data_root[kind]}{name}'))
+        dates = set()
+        for name in names:
+            match = re.search(r'_(\d{4}-\d{2}-\d{2})\.pkl$', name)
+            if match:
+                dates.add(dt.datetime.strptime(match.group(1), '%Y-%m-%d').date())
+        return sorted(d for d in dates if (from_date is None or d >= from_date) and (to_date is None or d <= to_date))
+
     def top_gainers(self, index: IndexSymbol = IndexSymbol.FnO, length: int = 10) -> pd.DataFrame:
         """
         get top gainers in given index
@@ -791,11 +1530,7 @@ class Nse:
         >>> nse.top_gainers(IndexSymbol.FnO,length=10)
 
         """
-        gainers = self.__gainers_losers(index).sort_values(by=['pChange'],
-                                                           axis=0,
-                                                           ascending=False).head(length)
-        gainers = gainers[gainers.pChange > 0.]
-        return gainers
+        return self.__top_k(self.__gainers_losers(index), length, gainers=True)
 
     def top_losers(self, index: IndexSymbol = IndexSymbol.FnO, length: int = 10) -> pd.DataFrame:
         """
@@ -806,12 +1541,72 @@ class Nse:
         >>> nse.top_gainers(IndexSymbol.FnO,length=10)
 
         """
-        losers = self.__gainers_losers(index).sort_values(by=['pChange'],
-                                                          axis=0,
-                                                          ascending=True).head(length)
-        losers = losers[losers.pChange < 0.]
+        return self.__top_k(self.__gainers_losers(index), length, gainers=False)
+
+    @staticmethod
+    def __top_k(table, length, gainers=True):
+        """
+        rows with the largest (gainers) or smallest (losers) pChange, sorted
+        only the selected rows are sorted, the rest are partitioned out with argpartition
+        """
+        change = pd.to_numeric(table['pChange'], errors='coerce').values
+        change = change if gainers else -change
+        rows = np.flatnonzero(change > 0.)
+        k = min(length, len(rows))
+        if k == 0:
+            return table.iloc[[]]
+        if k < len(rows):
+            rows = rows[np.argpartition(-change[rows], k - 1)[:k]]
+        rows = rows[np.argsort(-change[rows], kind='stable')]
+        return table.iloc[rows]
+
+    def __bulk_snapshot(self, symbols):
+        """
+        one table covering as many of symbols as possible
+        NIFTY 500 covers every index, F&O stocks outside it are fetched only if needed
+        the index underlyings NIFTY and BANKNIFTY added to the F&O list are never in these tables
+        """
+        tables, missing = list(), set(symbols) - {'NIFTY', 'BANKNIFTY'}
+        for index in [IndexSymbol.Nifty500, IndexSymbol.FnO]:
+            if not missing:
+                break
+            table = self.__gainers_losers(index)
+            tables.append(table)
+            missing -= set(table.index)
+        if missing:
+            logger.warning(f'{len(missing)} symbols not found in snapshot')
+        snapshot = pd.concat(tables)
+        return snapshot[~snapshot.index.duplicated()]
+
+    def top_movers(self, universes=None, length: int = 10, snapshot: pd.DataFrame = None) -> dict:
+        """
+        top gainers and losers for many indices or symbol lists from a single snapshot
+
+        universes is a list of IndexSymbol or a dict of name and list of symbols,
+        by default every index in self.symbols
+
+        returns dict of {name: {'gainers': pd.DataFrame, 'losers': pd.DataFrame}}
+
+        Examples
+        --------
+
+        >>> nse.top_movers([IndexSymbol.Nifty50, IndexSymbol.NiftyBank], length=5)
 
-        return losers
+        >>> nse.top_movers({'watchlist': ['SBIN', 'INFY', 'TCS']})
+
+        """
+        if universes is None:
+            universes = [i for i in IndexSymbol if i != IndexSymbol.All]
+        if not isinstance(universes, dict):
+            universes = {i.name: self.symbols[i.name] for i in universes}
+        if snapshot is None:
+            snapshot = self.__bulk_snapshot(set().union(*universes.values()))
+        movers = dict()
+        for name, symbols in universes.items():
+            table = snapshot[snapshot.index.isin(symbols)]
+            movers[name] = {'gainers': self.__top_k(table, length, gainers=True),
+                            'losers': self.__top_k(table, length, gainers=False)}
+        return movers
 
     def eq_stock_watch(self) -> pd.DataFrame:
         """
@@ -827,11 +1622,8 @@ class Nse:
         """
         req_date = self.__trading_days()[-1].date()
         filename = f'{self.data_root["eq_stock_watch"]}eq_stock_watch_{req_date}.pkl'
-        eq_stock_watch = None
-        if os.path.exists(filename):
-            eq_stock_watch = pd.read_pickle(filename)
-            logger.debug(f'read {filename} from disk')
-        else:
+
+        def download():
             config = self.__urls
             url = config['host'] + config['path']['equity_stock_watch']
             csv = self.__get_resp(url).content.decode('utf8').replace(" ", "")
@@ -840,9 +1632,9 @@ class Nse:
             logger.debug("downloading eq_stock_watch for {}".format(req_date))
             eq_stock_watch.set_index('SYMBOL', inplace=True)
             eq_stock_watch.dropna(axis=1, inplace=True)
-            eq_stock_watch.to_pickle(filename)
+            return eq_stock_watch
 
-        return eq_stock_watch
+        return self.__cached(filename, download)
 
     def daily_delivery(self, req_date: dt.date = None) -> pd.DataFrame:
         """
@@ -859,24 +1651,13 @@ class Nse:
 
         """
         req_date = self.__trading_days()[-1].date() if req_date is None else req_date
-        filename = f'{self.data_root["daily_delivery"]}daily_delivery_{req_date}.pkl'
-        daily_delivery = None
-        if os.path.exists(filename):
-            daily_delivery = pd.read_pickle(filename)
-            logger.debug(f'read {filename} from disk')
-        else:
-            config = self.__urls
-            url = config['path']['daily_delivery'].format(date=req_date.strftime("%d%m%Y").upper())
-            csv = self.__get_resp(url).content.decode('utf8').replace(" ", "")
-            daily_delivery = pd.read_csv(io.StringIO(csv), skiprows=3, index_col=False)
-            daily_delivery.columns = list(map((lambda x: x.strip()), daily_delivery.columns))
-            daily_delivery.rename(columns={'NameofSecurity':'SYMBOL'}, inplace=True)
+        filename, url, parse = self.__archive('daily_delivery', req_date)
+
+        def download():
             logger.debug("downloading daily_delivery for {}".format(req_date))
-            daily_delivery.set_index('SYMBOL', inplace=True)
-            daily_delivery.dropna(axis=1, inplace=True)
-            daily_delivery.to_pickle(filename)
+            return parse(self.__get_resp(url).content)
 
-        return daily_delivery
+        return self.__cached(filename, download)
 
     def insider_trading(self, from_date=None, to_date=None) -> pd.DataFrame:
         """
@@ -884,6 +1665,8 @@ class Nse:
         or
         read insider_trading if already downloaded
 
+        records of every call are kept in one store, only dates not downloaded before are requested
+
         Examples
         --------
         >>> nse.insider_trading()
@@ -895,20 +1678,18 @@ class Nse:
         if to_date == None:
             to_date = dt.date.today()
 
-        filename = f'{self.data_root["insider_trading"]}insider_trading_{from_date}_to_{to_date}.pkl'
-        insider_trading = None
-        if os.path.exists(filename):
-            insider_trading = pd.read_pickle(filename)
-            logger.debug(f'read {filename} from disk')
-        else:
-            insider_trading = pd.DataFrame()
+        filename = f'{self.data_root["insider_trading"]}insider_trading.pkl'
+
+        def download(from_date, to_date):
             url = config['host'] + config['path']['insider_trading'].format(from_date=from_date.strftime('%d-%m-%Y'),
                                                                  to_date=to_date.strftime('%d-%m-%Y'))
             data = self.__get_resp(url).json()
             insider_trading = pd.DataFrame(data['data'])
-            insider_trading.drop(['xbrl', 'tkdAcqm', 'anex', 'derivativeType', 'remarks'], axis=1, inplace=True)
-            insider_trading.to_pickle(filename)
-        return insider_trading
+            insider_trading.drop(['xbrl', 'tkdAcqm', 'anex', 'derivativeType', 'remarks'], axis=1, inplace=True,
+                                 errors='ignore')
+            return insider_trading
+
+        return self.__range_cached(filename, from_date, to_date, download, 'date')
 
     def corp_info(self, symbol: str = 'SBIN', month=None, use_pickle=True):
         """
@@ -944,6 +1725,5 @@ class Nse:
                 corp_info['pledge_details'] = pd.DataFrame(data['corporate']['pledgedetails'])
                 corp_info['sast_Regulations_29'] = pd.DataFrame(data['corporate']['sastRegulations_29'])
                 if use_pickle:
-                    with open(filename, 'wb') as pk:
-                        pickle.dump(corp_info, pk, protocol=pickle.HIGHEST_PROTOCOL)
+                    _atomic_write(filename, lambda tmp: pd.to_pickle(corp_info, tmp, protocol=pickle.HIGHEST_PROTOCOL))
         return corp_info
@@ -0,0 +1,177 @@
+import datetime as dt
+import hashlib
+import logging
+import os
+import numpy as np
+import pandas as pd
+
+from .pynse import _atomic_write, _record
+from .indicators import shift, pct_change, sma, ema, rsi, rolling_max, rolling_min
+
+logger = logging.getLogger(__name__)
+
+# bhavcopy column for every panel field
+BHAVCOPY_FIELDS = {'prev_close': 'PREV_CLOSE', 'open': 'OPEN_PRICE', 'high': 'HIGH_PRICE', 'low': 'LOW_PRICE',
+                   'close': 'CLOSE_PRICE', 'vwap': 'AVG_PRICE', 'volume': 'TTL_TRD_QNTY',
+                   'turnover': 'TURNOVER_LACS', 'trades': 'NO_OF_TRADES', 'deliv_qty': 'DELIV_QTY',
+                   'deliv_per': 'DELIV_PER'}
+
+
+class Screener:
+    """
+    vectorized screens over bhavcopy and daily delivery data
+
+    data for a date range is loaded once into (date x symbol) panels, one numpy array per field.
+    screen expressions are evaluated on whole panels, so every symbol and date is computed at once.
+    the last panel built for a symbol list is kept in the screener folder and reused while no bhavcopy
+    or daily delivery is downloaded for its range, loading another range replaces it.
+
+    fields: prev_close, open, high, low, close, vwap, volume, turnover, trades, deliv_qty, deliv_per
+    functions: sma, ema, rsi, rolling_max, rolling_min, shift, pct_change, abs, log, where
+
+    Examples
+    --------
+
+    >>> screener = Screener(nse)
+    >>> screener.load(dt.date(2019, 7, 1), dt.date(2020, 7, 1), symbols=nse.symbols['Nifty500'])
+    >>> screener.screen('(close > shift(rolling_max(high, 250))) & (volume > 2 * sma(volume, 20))',
+    ...                 rank_by='volume / sma(volume, 20)')
+
+    """
+
+    functions = {'sma': sma, 'ema': ema, 'rsi': rsi, 'rolling_max': rolling_max, 'rolling_min': rolling_min,
+                 'shift': shift, 'pct_change': pct_change, 'abs': np.abs, 'log': np.log, 'where': np.where}
+
+    def __init__(self, nse):
+        self.nse = nse
+        self.dates = pd.DatetimeIndex([])
+        self.symbols = pd.Index([])
+        self.fields = dict()
+
+    def __panel_file(self, symbols, series):
+        key = hashlib.md5(','.join(sorted(symbols)).encode()).hexdigest()[:10] if symbols is not None else 'all'
+        return f"{self.nse.data_root['screener']}panel_{series}_{key}.npz"
+
+    def load(self, from_date: dt.date, to_date: dt.date = None, symbols: list = None, series: str = 'EQ',
+             download: bool = False):
+        """
+        load bhavcopy and delivery data of every trading day in the range into panels
+
+        :param symbols: symbols to keep, every symbol in the bhavcopy if None
+        :param download: download missing bhavcopies, otherwise only days already on disk are used
+        """
+        to_date = dt.date.today() if to_date is None else to_date
+        if download:
+            cached = set(self.nse.cached_dates('bhavcopy_eq', from_date, to_date))
+            missing = [date for date in self.nse.trading_calendar(from_date, to_date) if date not in cached]
+            for _ in self.nse.bulk('bhavcopy_eq', missing):
+                pass
+        dates = self.nse.cached_dates('bhavcopy_eq', from_date, to_date)
+        if not dates:
+            raise FileNotFoundError(f'no bhavcopy between {from_date} and {to_date}')
+
+        delivery_dates = self.nse.cached_dates('daily_delivery', dates[0], dates[-1])
+        filename = self.__panel_file(symbols, series)
+        if os.path.exists(filename):
+            with np.load(filename, allow_pickle=False) as panel:
+                if 'delivery_dates' in panel.files and list(panel['dates']) == [np.datetime64(d, 'D') for d in dates] \
+                        and list(panel['delivery_dates']) == [np.datetime64(d, 'D') for d in delivery_dates]:
+                    self.dates = pd.DatetimeIndex(panel['dates'])
+                    self.symbols = pd.Index(panel['symbols'])
+                    self.fields = {f: panel[f] for f in BHAVCOPY_FIELDS}
+                    _record(filename)
+                    logger.debug(f'read {filename} from disk')
+                    return self
+        self.__build(dates, delivery_dates, symbols, series)
+        arrays = dict(self.fields, dates=np.asarray(self.dates, dtype='datetime64[D]'),
+                      delivery_dates=np.asarray(delivery_dates, dtype='datetime64[D]'),
+                      symbols=np.asarray(self.symbols, dtype=str))
+
+        def write(tmp):
+            with open(tmp, 'wb') as f:
+                np.savez(f, **arrays)
+
+        _atomic_write(filename, write)
+        return self
+
+    def __build(self, dates, delivery_dates, symbols, series):
+        delivery_dates = set(delivery_dates)
+        frames = list()
+        for date in dates:
+            bhavcopy = self.nse.bhavcopy(date, series=series).reset_index('SERIES')
+            frame = pd.DataFrame({f: pd.to_numeric(bhavcopy[c], errors='coerce') for f, c in BHAVCOPY_FIELDS.items()
+                                  if c in bhavcopy.columns}, index=bhavcopy.index)
+            if date in delivery_dates:
+                delivery = self.__delivery(self.nse.daily_delivery(date))
+                for f in ('deliv_qty', 'deliv_per'):
+                    values = delivery[f].reindex(frame.index)
+                    frame[f] = values.fillna(frame[f]) if f in frame.columns else values
+            frame['date'] = np.datetime64(date, 'D')
+            frames.append(frame[~frame.index.duplicated()])
+        data = pd.concat(frames)
+
+        self.dates = pd.DatetimeIndex(dates)
+        self.symbols = pd.Index(sorted(set(data.index) if symbols is None else symbols))
+        rows = self.dates.get_indexer(pd.DatetimeIndex(data['date']))
+        cols = self.symbols.get_indexer(data.index)
+        keep = cols >= 0
+        self.fields = dict()
+        for f in BHAVCOPY_FIELDS:
+            panel = np.full((len(self.dates), len(self.symbols)), np.nan)
+            if f in data.columns:
+                panel[rows[keep], cols[keep]] = data[f].values[keep]
+            self.fields[f] = panel
+        logger.debug(f'built panel of {len(self.dates)} days and {len(self.symbols)} symbols')
+
+    @staticmethod
+    def __delivery(daily_delivery):
+        """
+        deliverable quantity and percentage from a daily_delivery table
+        columns are matched by name as the MTO file layout differs between years
+        """
+        columns = {'deliv_qty': [c for c in daily_delivery.columns if c.startswith('Deliverable')],
+                   'deliv_per': [c for c in daily_delivery.columns if c.startswith('%')]}
+        delivery = pd.DataFrame(index=daily_delivery.index)
+        for f, c in columns.items():
+            delivery[f] = pd.to_numeric(daily_delivery[c[0]], errors='coerce') if c else np.nan
+        return delivery[~delivery.index.duplicated()]
+
+    def evaluate(self, expr) -> pd.DataFrame:
+        """
+        evaluate an expression on the panels
+        expr is a string using the fields and functions or a callable taking a dict of them
+
+        returns (date x symbol) DataFrame
+
+        >>> screener.evaluate('sma(deliv_per, 20)')
+        """
+        if not self.fields:
+            raise ValueError('no data loaded, call load first')
+        namespace = dict(self.functions, **self.fields)
+        if callable(expr):
+            values = expr(namespace)
+        else:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                values = eval(expr, {'__builtins__': {}}, namespace)
+        values = np.broadcast_to(values, (len(self.dates), len(self.symbols)))
+        return pd.DataFrame(values, index=self.dates, columns=self.symbols)
+
+    def screen(self, expr, rank_by=None, on: dt.date = None, ascending: bool = False,
+               length: int = None) -> pd.DataFrame:
+        """
+        symbols for which expr is true on a date, ranked by rank_by
+
+        :param on: date of the screen, last loaded date if None
+        :param length: number of results, all if None
+
+        >>> screener.screen('deliv_per > 60', rank_by='sma(deliv_per, 20)', length=20)
+        """
+        mask = self.evaluate(expr)
+        row = -1 if on is None else self.dates.get_loc(pd.Timestamp(on))
+        selected = mask.values[row] == True
+        result = pd.DataFrame({f: self.fields[f][row, selected] for f in ('close', 'volume', 'deliv_per')},
+                              index=self.symbols[selected])
+        if rank_by is not None:
+            result.insert(0, 'score', self.evaluate(rank_by).values[row, selected])
+            result.sort_values('score', ascending=ascending, inplace=True)
+        return result if length is None else result.head(length)
@@ -12,6 +12,7 @@ setup(
     url='https://github.com/anoopjangra',
     include_package_data=True,
     package_data={'':['symbol_list/*']},
+    entry_points={'console_scripts': ['pynse=pynse.cli:main']},
     author='Anoop Jangra',
     author_email='anoopjangra@gmail.com',
     description='Library to extract realtime and historical data from NSE website',